@@ -8,12 +8,16 @@ wechat-mp-skill 打包脚本
     uv run python build_skill.py
     uv run python build_skill.py --output dist/
     uv run python build_skill.py --version 0.2.0
+    uv run python build_skill.py --level 6
 """
 
 import argparse
+import fnmatch
+import os
 import zipfile
 import json
 import re
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
 
@@ -26,6 +30,16 @@ INCLUDE_PATTERNS = [
     "references/*.md",
 ]
 
+# DEFLATE 压缩级别（zlib 支持 1-9，默认取最高压缩比）
+DEFAULT_COMPRESS_LEVEL = 9
+
+# pyproject.toml 中的版本号（[project] 表位于文件开头，只需读取头部）
+_VERSION_RE = re.compile(rb'version\s*=\s*"([^"]+)"')
+_PYPROJECT_HEAD_SIZE = 4096
+
+# SKILL.md 的 YAML frontmatter
+_FRONTMATTER_RE = re.compile(r"\A---\n(.*?)\n---", re.DOTALL)
+
 # 排除的文件模式
 EXCLUDE_PATTERNS = [
     "__pycache__",
@@ -34,60 +48,79 @@ EXCLUDE_PATTERNS = [
     ".wechat_token_cache.json",
 ]
 
+# 排除模式合并为一个正则（子串匹配，* 匹配任意字符）
+_EXCLUDE_RE = re.compile(
+    "|".join(re.escape(p).replace(r"\*", ".*") for p in EXCLUDE_PATTERNS)
+)
 
+
+@lru_cache(maxsize=None)
 def get_version_from_pyproject() -> str:
-    """从 pyproject.toml 读取版本号"""
+    """从 pyproject.toml 读取版本号（结果缓存，文件变更后需调用 cache_clear()）"""
     pyproject_path = Path(__file__).parent / "pyproject.toml"
     if pyproject_path.exists():
-        content = pyproject_path.read_text(encoding="utf-8")
-        match = re.search(r'version\s*=\s*"([^"]+)"', content)
+        with open(pyproject_path, "rb") as f:
+            head = f.read(_PYPROJECT_HEAD_SIZE)
+        match = _VERSION_RE.search(head)
         if match:
-            return match.group(1)
+            return match.group(1).decode("utf-8")
     return "0.1.0"
 
 
+@lru_cache(maxsize=None)
 def get_skill_metadata() -> dict:
-    """从 SKILL.md 读取元数据"""
+    """从 SKILL.md 读取元数据（结果缓存，文件变更后需调用 cache_clear()）"""
     skill_path = Path(__file__).parent / "SKILL.md"
     metadata = {"name": "wechat-mp-skill", "description": ""}
 
     if skill_path.exists():
-        content = skill_path.read_text(encoding="utf-8")
         # 解析 YAML frontmatter
-        if content.startswith("---"):
-            end = content.find("---", 3)
-            if end != -1:
-                frontmatter = content[3:end].strip()
-                for line in frontmatter.split("\n"):
-                    if ":" in line:
-                        key, _, value = line.partition(":")
-                        key = key.strip()
-                        value = value.strip()
-                        if key in ("name", "description"):
-                            metadata[key] = value
+        match = _FRONTMATTER_RE.match(skill_path.read_text(encoding="utf-8"))
+        if match:
+            for line in match.group(1).split("\n"):
+                if ":" in line:
+                    key, _, value = line.partition(":")
+                    key = key.strip()
+                    value = value.strip()
+                    if key in ("name", "description"):
+                        metadata[key] = value
 
     return metadata
 
 
 def should_exclude(path: Path) -> bool:
     """检查文件是否应该被排除"""
-    path_str = str(path)
-    for pattern in EXCLUDE_PATTERNS:
-        if pattern in path_str:
-            return True
-    return False
+    return _EXCLUDE_RE.search(str(path)) is not None
+
+
+def scan_files(directory: Path) -> list[os.DirEntry]:
+    """列出目录下的文件（按文件名排序，保证打包顺序稳定）"""
+    if not directory.is_dir():
+        return []
+    with os.scandir(directory) as entries:
+        return sorted(
+            (entry for entry in entries if entry.is_file()),
+            key=lambda entry: entry.name
+        )
 
 
 def collect_files(root: Path) -> list[tuple[Path, str]]:
     """收集需要打包的文件"""
     files = []
+    # 目录 -> 文件列表，每个目录只扫描一次
+    listings: dict[str, list[os.DirEntry]] = {}
 
     for pattern in INCLUDE_PATTERNS:
         if "*" in pattern:
-            # glob 模式
-            for file_path in root.glob(pattern):
-                if file_path.is_file() and not should_exclude(file_path):
-                    arcname = str(file_path.relative_to(root))
+            # glob 模式：扫描所在目录，用编译后的正则匹配文件名
+            dirname, _, name_pattern = pattern.rpartition("/")
+            if dirname not in listings:
+                listings[dirname] = scan_files(root / dirname)
+            name_re = re.compile(fnmatch.translate(name_pattern))
+            for entry in listings[dirname]:
+                file_path = Path(entry.path)
+                if name_re.match(entry.name) and not should_exclude(file_path):
+                    arcname = f"{dirname}/{entry.name}" if dirname else entry.name
                     files.append((file_path, arcname))
         else:
             # 精确路径
@@ -98,17 +131,25 @@ def collect_files(root: Path) -> list[tuple[Path, str]]:
     return files
 
 
-def build_skill(output_dir: Path, version: str = None) -> Path:
+def build_skill(
+    output_dir: Path,
+    version: str = None,
+    level: int = DEFAULT_COMPRESS_LEVEL
+) -> Path:
     """
     构建 .zip 包
 
     Args:
         output_dir: 输出目录
         version: 版本号（可选，默认从 pyproject.toml 读取）
+        level: DEFLATE 压缩级别 1-9（默认 9）
 
     Returns:
         生成的 .zip 文件路径
     """
+    if not 1 <= level <= 9:
+        raise ValueError(f"压缩级别必须在 1-9 之间: {level}")
+
     root = Path(__file__).parent
 
     # 获取版本和元数据
@@ -131,7 +172,9 @@ def build_skill(output_dir: Path, version: str = None) -> Path:
     print(f"包含 {len(files)} 个文件:")
 
     # 创建 zip 包
-    with zipfile.ZipFile(output_file, "w", zipfile.ZIP_DEFLATED) as zf:
+    with zipfile.ZipFile(
+        output_file, "w", zipfile.ZIP_DEFLATED, compresslevel=level
+    ) as zf:
         for file_path, arcname in files:
             print(f"  + {arcname}")
             zf.write(file_path, arcname)
@@ -151,13 +194,18 @@ def build_skill(output_dir: Path, version: str = None) -> Path:
     size_kb = output_file.stat().st_size / 1024
     print(f"\n构建完成! 文件大小: {size_kb:.1f} KB")
 
-    # 同时创建不带版本号的文件（便于下载）
+    # 同时创建不带版本号的文件（便于下载），优先使用硬链接避免重复写盘
     latest_file = output_dir / f"{skill_name}.zip"
     if latest_file.exists():
         latest_file.unlink()
-    import shutil
-    shutil.copy(output_file, latest_file)
-    print(f"复制到: {latest_file}")
+    try:
+        os.link(output_file, latest_file)
+        print(f"链接到: {latest_file}")
+    except OSError:
+        # 文件系统不支持硬链接时回退为复制
+        import shutil
+        shutil.copy2(output_file, latest_file)
+        print(f"复制到: {latest_file}")
 
     return output_file
 
@@ -178,10 +226,18 @@ def main():
         default=None,
         help="版本号 (默认从 pyproject.toml 读取)"
     )
+    parser.add_argument(
+        "--level", "-l",
+        type=int,
+        choices=range(1, 10),
+        default=DEFAULT_COMPRESS_LEVEL,
+        metavar="{1-9}",
+        help=f"DEFLATE 压缩级别 (默认: {DEFAULT_COMPRESS_LEVEL})"
+    )
 
     args = parser.parse_args()
 
-    build_skill(args.output, args.version)
+    build_skill(args.output, args.version, args.level)
 
 
 if __name__ == "__main__":
@@ -18,6 +18,17 @@ ArticleType = Literal["news", "newspic"]
 class DraftManager:
     """草稿管理器"""
     
+    # 文章必填字段
+    REQUIRED_FIELDS = ("title", "content")
+    _REQUIRED_FIELD_SET = frozenset(REQUIRED_FIELDS)
+    
+    # 文章字段长度限制：(字段, 最大长度, 字段名称)
+    FIELD_LIMITS = (
+        ("title", 32, "标题"),
+        ("author", 16, "作者名"),
+        ("digest", 128, "摘要"),
+    )
+    
     def __init__(self, client: WeChatClient):
         """
         初始化草稿管理器
@@ -29,23 +40,16 @@ class DraftManager:
     
     def _validate_article(self, article: Dict[str, Any]) -> Dict[str, Any]:
         """验证并规范化文章数据"""
-        required_fields = ["title", "content"]
-        
-        for field in required_fields:
-            if field not in article:
-                raise ValueError(f"文章缺少必填字段: {field}")
-        
-        # 标题长度检查
-        if len(article["title"]) > 32:
-            raise ValueError("标题长度不能超过32个字符")
-        
-        # 作者长度检查
-        if article.get("author") and len(article["author"]) > 16:
-            raise ValueError("作者名长度不能超过16个字符")
+        # 常见情况下必填字段齐全，一次集合比较即可通过
+        if not article.keys() >= self._REQUIRED_FIELD_SET:
+            missing = next(f for f in self.REQUIRED_FIELDS if f not in article)
+            raise ValueError(f"文章缺少必填字段: {missing}")
         
-        # 摘要长度检查
-        if article.get("digest") and len(article["digest"]) > 128:
-            raise ValueError("摘要长度不能超过128个字符")
+        # 长度检查
+        for field, limit, label in self.FIELD_LIMITS:
+            value = article.get(field)
+            if value and len(value) > limit:
+                raise ValueError(f"{label}长度不能超过{limit}个字符")
         
         return article
     
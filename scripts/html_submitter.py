@@ -4,9 +4,12 @@ HTML 文章提交模块
 接收 HTML 文件，自动处理图片上传并创建草稿
 """
 
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict
 from urllib.parse import unquote
 
 try:
@@ -19,6 +22,23 @@ except ImportError:
     from draft_manager import DraftManager, create_simple_article
 
 
+# 正文图片并发上传的最大线程数（避免触发微信接口频率限制）
+MAX_UPLOAD_WORKERS = 8
+
+# 匹配 <img> 标签的 src 属性，分组: 1=src= 之前的内容, 2=引号, 3=src 值
+# 提取与替换共用同一模式，保证替换的正是提取出的图片
+# 属性部分非贪婪匹配，且 src 前必须是空白：避免长属性串上的回溯，
+# 也不会误匹配 data-src 等以 src 结尾的属性
+_IMG_SRC_RE = re.compile(
+    r'(<img\b[^>]*?\ssrc\s*=\s*)(["\'])([^"\']+)\2', re.IGNORECASE
+)
+# 快速判断是否包含 <img 标签（纯文字文章直接跳过完整匹配）
+_IMG_TAG_RE = re.compile(r'<img', re.IGNORECASE)
+_TITLE_RE = re.compile(r'<title[^>]*>(.+?)</title>', re.IGNORECASE | re.DOTALL)
+_BODY_OPEN_RE = re.compile(r'<body[^>]*>', re.IGNORECASE)
+_BODY_CLOSE_RE = re.compile(r'</body\s*>', re.IGNORECASE)
+
+
 class HtmlSubmitError(Exception):
     """HTML 提交错误"""
     pass
@@ -33,9 +53,10 @@ class ImageUploadError(HtmlSubmitError):
         super().__init__(f"图片上传失败: {path}\n原因: {reason}")
 
 
+@lru_cache(maxsize=512)
 def _parse_file_uri(uri: str) -> str:
     """
-    解析 file:// URI 为本地路径
+    解析 file:// URI 为本地路径（纯函数，结果缓存供重复引用的图片复用）
 
     支持格式:
     - file:///C:/Users/... (Windows)
@@ -63,6 +84,21 @@ def _parse_file_uri(uri: str) -> str:
     return unquote(path)
 
 
+def _read_html(path: Path) -> str:
+    """
+    读取 HTML 文件
+
+    按字节读取后解码，保留原始换行符（\r\n 不会被转换）
+
+    Args:
+        path: HTML 文件路径
+
+    Returns:
+        UTF-8 解码后的 HTML 内容
+    """
+    return path.read_bytes().decode("utf-8")
+
+
 def _extract_local_images(html: str, html_dir: Path) -> List[Tuple[str, str]]:
     """
     从 HTML 中提取本地图片路径
@@ -74,11 +110,13 @@ def _extract_local_images(html: str, html_dir: Path) -> List[Tuple[str, str]]:
     Returns:
         列表，每项为 (原始 src 值, 本地文件路径)
     """
-    img_pattern = r'<img[^>]+src=["\']([^"\']+)["\']'
+    if not _IMG_TAG_RE.search(html):
+        return []
+
     local_images = []
 
-    for match in re.finditer(img_pattern, html, re.IGNORECASE):
-        src = match.group(1)
+    for match in _IMG_SRC_RE.finditer(html):
+        src = match.group(3)
 
         # 跳过已经是 http/https 的 URL
         if src.startswith(("http://", "https://")):
@@ -96,22 +134,89 @@ def _extract_local_images(html: str, html_dir: Path) -> List[Tuple[str, str]]:
     return local_images
 
 
+def _replace_image_srcs(html: str, url_map: Dict[str, str]) -> str:
+    """
+    一次扫描替换 HTML 中所有 <img> 的 src
+
+    Args:
+        html: HTML 内容
+        url_map: 原始 src 值 -> 新 URL 的映射，未包含的 src 保持不变
+
+    Returns:
+        替换后的 HTML
+    """
+    if not url_map:
+        return html
+
+    def _sub(match: re.Match) -> str:
+        src = match.group(3)
+        return f"{match.group(1)}{match.group(2)}{url_map.get(src, src)}{match.group(2)}"
+
+    return _IMG_SRC_RE.sub(_sub, html)
+
+
 def _extract_title(html: str) -> Optional[str]:
     """从 HTML 中提取标题"""
-    match = re.search(r'<title>(.+?)</title>', html, re.IGNORECASE | re.DOTALL)
+    match = _TITLE_RE.search(html)
     if match:
         return match.group(1).strip()
     return None
 
 
 def _extract_body(html: str) -> str:
-    """从 HTML 中提取 body 内容"""
-    match = re.search(r'<body[^>]*>(.*?)</body>', html, re.IGNORECASE | re.DOTALL)
+    """
+    从 HTML 中提取 body 内容
+
+    以最后一个 </body> 作为结束位置：只需线性查找，
+    且正文注释或脚本中出现的 </body> 不会截断内容
+    """
+    match = _BODY_OPEN_RE.search(html)
     if match:
-        return match.group(1).strip()
+        # 取最后一个 </body>
+        close = None
+        for close in _BODY_CLOSE_RE.finditer(html, match.end()):
+            pass
+        if close is not None:
+            return html[match.end():close.start()].strip()
     return html
 
 
+def _upload_article_images(
+    mm: MaterialManager,
+    files: Dict[str, Tuple[str, os.stat_result]]
+) -> Dict[str, str]:
+    """
+    并发上传正文图片
+
+    Args:
+        mm: 素材管理器
+        files: 去重后的真实路径 -> (HTML 中首次出现的本地路径, 已获取的 os.stat 结果)
+
+    Returns:
+        真实路径 -> 微信图片 URL 的映射
+
+    Raises:
+        ImageUploadError: 任一图片上传失败（报告 HTML 中书写的路径）
+    """
+    if not files:
+        return {}
+
+    workers = min(MAX_UPLOAD_WORKERS, len(files))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            real_path: executor.submit(mm.upload_article_image, real_path, stat_result)
+            for real_path, (_, stat_result) in files.items()
+        }
+
+    urls = {}
+    for real_path, future in futures.items():
+        try:
+            urls[real_path] = future.result()
+        except Exception as e:
+            raise ImageUploadError(files[real_path][0], str(e))
+    return urls
+
+
 def submit_html_draft(
     html_path: str,
     cover_path: str,
@@ -151,7 +256,9 @@ def submit_html_draft(
     # 验证文件存在
     if not html_file.exists():
         raise FileNotFoundError(f"HTML 文件不存在: {html_path}")
-    if not cover_file.exists():
+    try:
+        cover_stat = os.stat(cover_file)
+    except FileNotFoundError:
         raise FileNotFoundError(f"封面图不存在: {cover_path}")
 
     # 初始化客户端
@@ -162,7 +269,7 @@ def submit_html_draft(
     dm = DraftManager(client)
 
     # 1. 读取 HTML
-    html_content = html_file.read_text(encoding="utf-8")
+    html_content = _read_html(html_file)
 
     # 2. 提取标题
     if not title:
@@ -176,25 +283,37 @@ def submit_html_draft(
     # 4. 解析本地图片
     local_images = _extract_local_images(body_html, html_file.parent)
 
-    # 5. 上传封面图
+    # 5. 上传封面图（同时完成 access_token 获取，后续并发上传直接复用）
     try:
-        cover_media_id = mm.upload_permanent("image", str(cover_file))
+        cover_media_id = mm.upload_permanent(
+            "image", str(cover_file), stat_result=cover_stat
+        )
     except Exception as e:
         raise ImageUploadError(str(cover_path), str(e))
 
-    # 6. 上传正文图片并替换 URL
-    for original_src, local_path in local_images:
-        if not Path(local_path).exists():
-            raise ImageUploadError(local_path, "文件不存在")
-
+    # 6. 并发上传正文图片，最后一次性替换 URL
+    # 按真实路径去重：相对路径、file:// URI、符号链接指向同一文件时只上传一次
+    # 每个文件只 stat 一次，结果传给上传时的大小校验
+    real_paths: Dict[str, str] = {}
+    image_files: Dict[str, Tuple[str, os.stat_result]] = {}
+    for _, local_path in local_images:
+        if local_path in real_paths:
+            continue
         try:
-            url = mm.upload_article_image(local_path)
-        except Exception as e:
+            stat_result = os.stat(local_path)
+        except FileNotFoundError:
+            raise ImageUploadError(local_path, "文件不存在")
+        except OSError as e:
             raise ImageUploadError(local_path, str(e))
-
-        # 替换 src（保持引号类型）
-        body_html = body_html.replace(f'src="{original_src}"', f'src="{url}"')
-        body_html = body_html.replace(f"src='{original_src}'", f"src='{url}'")
+        real_path = os.path.realpath(local_path)
+        real_paths[local_path] = real_path
+        image_files.setdefault(real_path, (local_path, stat_result))
+
+    uploaded = _upload_article_images(mm, image_files)
+    url_map = {
+        src: uploaded[real_paths[path]] for src, path in local_images
+    }
+    body_html = _replace_image_srcs(body_html, url_map)
 
     # 7. 创建草稿
     article = create_simple_article(
@@ -5,7 +5,6 @@
 """
 
 import os
-import mimetypes
 from typing import Optional, Dict, Any, List, Literal
 from pathlib import Path
 
@@ -49,16 +48,25 @@ class MaterialManager:
     def _validate_file(
         self,
         file_path: str,
-        media_type: MaterialType
+        media_type: MaterialType,
+        stat_result: Optional[os.stat_result] = None
     ) -> None:
-        """验证文件是否符合要求"""
-        path = Path(file_path)
+        """
+        验证文件是否符合要求
         
-        if not path.exists():
-            raise FileNotFoundError(f"文件不存在: {file_path}")
+        Args:
+            file_path: 文件路径
+            media_type: 素材类型
+            stat_result: 调用方已获取的 os.stat 结果（可选，避免重复 stat）
+        """
+        if stat_result is None:
+            try:
+                stat_result = os.stat(file_path)
+            except FileNotFoundError:
+                raise FileNotFoundError(f"文件不存在: {file_path}")
         
         # 检查文件大小
-        size = path.stat().st_size
+        size = stat_result.st_size
         limit = self.SIZE_LIMITS.get(media_type, 10 * 1024 * 1024)
         if size > limit:
             raise ValueError(
@@ -73,7 +81,8 @@ class MaterialManager:
         media_type: MaterialType,
         file_path: str,
         title: Optional[str] = None,
-        introduction: Optional[str] = None
+        introduction: Optional[str] = None,
+        stat_result: Optional[os.stat_result] = None
     ) -> str:
         """
         上传永久素材
@@ -83,11 +92,12 @@ class MaterialManager:
             file_path: 文件路径
             title: 视频标题（仅视频类型需要）
             introduction: 视频描述（仅视频类型需要）
+            stat_result: 已获取的 os.stat 结果（可选，避免重复 stat）
             
         Returns:
             media_id: 素材 ID
         """
-        self._validate_file(file_path, media_type)
+        self._validate_file(file_path, media_type, stat_result)
         
         endpoint = "/cgi-bin/material/add_material"
         
@@ -113,7 +123,11 @@ class MaterialManager:
         
         return result["media_id"]
     
-    def upload_article_image(self, file_path: str) -> str:
+    def upload_article_image(
+        self,
+        file_path: str,
+        stat_result: Optional[os.stat_result] = None
+    ) -> str:
         """
         上传图文消息内的图片
         
@@ -121,11 +135,12 @@ class MaterialManager:
         
         Args:
             file_path: 图片文件路径
+            stat_result: 已获取的 os.stat 结果（可选，避免重复 stat）
             
         Returns:
             图片 URL（可在图文正文中使用）
         """
-        self._validate_file(file_path, "image")
+        self._validate_file(file_path, "image", stat_result)
         
         result = self.client.upload_file(
             "/cgi-bin/media/uploadimg",
@@ -4,8 +4,9 @@
 支持用户、图文、消息、接口等数据统计
 """
 
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import date, datetime, timedelta
 
 try:
     from .wechat_client import WeChatClient, WeChatAPIError
@@ -13,9 +14,31 @@ except ImportError:
     from wechat_client import WeChatClient, WeChatAPIError
 
 
+def _parse_date(value: str) -> date:
+    """解析 YYYY-MM-DD 格式的日期（固定格式，直接切片，避免 strptime 开销）"""
+    digits = value[0:4] + value[5:7] + value[8:10]
+    # int() 会接受正负号、空白、下划线和全角数字，先限定为 ASCII 数字
+    if (
+        len(value) != 10 or value[4] != "-" or value[7] != "-"
+        or not (digits.isascii() and digits.isdigit())
+    ):
+        raise ValueError(f"日期格式错误，应为 YYYY-MM-DD: {value}")
+    try:
+        return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+    except ValueError:
+        raise ValueError(f"日期格式错误，应为 YYYY-MM-DD: {value}") from None
+
+
+def _yesterday() -> date:
+    """本地时区的昨天（与 _validate_date_range 的 date.today() 保持一致）"""
+    return date.today() - timedelta(days=1)
+
+
 class StatsManager:
     """数据统计管理器"""
     
+    __slots__ = ("client",)
+    
     # 最大查询跨度（天）
     MAX_USER_DAYS = 7
     MAX_ARTICLE_DAYS = 1
@@ -42,8 +65,8 @@ class StatsManager:
         max_days: int
     ) -> None:
         """验证日期范围"""
-        begin = datetime.strptime(begin_date, "%Y-%m-%d")
-        end = datetime.strptime(end_date, "%Y-%m-%d")
+        begin = _parse_date(begin_date)
+        end = _parse_date(end_date)
         
         if begin > end:
             raise ValueError("开始日期不能晚于结束日期")
@@ -51,9 +74,35 @@ class StatsManager:
         if (end - begin).days > max_days:
             raise ValueError(f"日期跨度不能超过 {max_days} 天")
         
-        if end >= datetime.now():
+        if end >= date.today():
+            raise ValueError("结束日期不能是今天或未来日期")
+    
+    def _validate_single_date(self, day: str) -> None:
+        """验证单日查询日期（起止相同，只需检查是否为今天或未来日期）"""
+        if _parse_date(day) >= date.today():
             raise ValueError("结束日期不能是今天或未来日期")
     
+    def _query(
+        self,
+        endpoint: str,
+        begin_date: str,
+        end_date: str,
+        max_days: int
+    ) -> List[Dict[str, Any]]:
+        """校验日期范围后请求统计接口，返回数据列表"""
+        if begin_date == end_date:
+            self._validate_single_date(begin_date)
+        else:
+            self._validate_date_range(begin_date, end_date, max_days)
+        result = self.client.post(
+            endpoint,
+            json_data={
+                "begin_date": begin_date,
+                "end_date": end_date
+            }
+        )
+        return result.get("list", [])
+    
     # ==================== 用户数据 ====================
     
     def get_user_summary(
@@ -75,16 +124,9 @@ class StatsManager:
             - new_user: 新增用户数
             - cancel_user: 取消关注数
         """
-        self._validate_date_range(begin_date, end_date, self.MAX_USER_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getusersummary",
-            json_data={
-                "begin_date": begin_date,
-                "end_date": end_date
-            }
+        return self._query(
+            "/datacube/getusersummary", begin_date, end_date, self.MAX_USER_DAYS
         )
-        return result.get("list", [])
     
     def get_user_cumulate(
         self,
@@ -103,16 +145,9 @@ class StatsManager:
             - ref_date: 日期
             - cumulate_user: 累计用户数
         """
-        self._validate_date_range(begin_date, end_date, self.MAX_USER_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getusercumulate",
-            json_data={
-                "begin_date": begin_date,
-                "end_date": end_date
-            }
+        return self._query(
+            "/datacube/getusercumulate", begin_date, end_date, self.MAX_USER_DAYS
         )
-        return result.get("list", [])
     
     # ==================== 图文数据 ====================
     
@@ -137,16 +172,9 @@ class StatsManager:
             - add_to_fav_user: 收藏人数
             - add_to_fav_count: 收藏次数
         """
-        self._validate_date_range(date, date, self.MAX_ARTICLE_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getarticlesummary",
-            json_data={
-                "begin_date": date,
-                "end_date": date
-            }
+        return self._query(
+            "/datacube/getarticlesummary", date, date, self.MAX_ARTICLE_DAYS
         )
-        return result.get("list", [])
     
     def get_article_total(self, date: str) -> List[Dict[str, Any]]:
         """
@@ -160,16 +188,9 @@ class StatsManager:
         Returns:
             图文总数据列表
         """
-        self._validate_date_range(date, date, self.MAX_ARTICLE_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getarticletotal",
-            json_data={
-                "begin_date": date,
-                "end_date": date
-            }
+        return self._query(
+            "/datacube/getarticletotal", date, date, self.MAX_ARTICLE_DAYS
         )
-        return result.get("list", [])
     
     def get_user_read(
         self,
@@ -186,16 +207,7 @@ class StatsManager:
         Returns:
             阅读概况数据列表
         """
-        self._validate_date_range(begin_date, end_date, 3)
-        
-        result = self.client.post(
-            "/datacube/getuserread",
-            json_data={
-                "begin_date": begin_date,
-                "end_date": end_date
-            }
-        )
-        return result.get("list", [])
+        return self._query("/datacube/getuserread", begin_date, end_date, 3)
     
     def get_user_read_hour(self, date: str) -> List[Dict[str, Any]]:
         """
@@ -207,16 +219,9 @@ class StatsManager:
         Returns:
             每小时阅读数据列表
         """
-        self._validate_date_range(date, date, self.MAX_ARTICLE_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getuserreadhour",
-            json_data={
-                "begin_date": date,
-                "end_date": date
-            }
+        return self._query(
+            "/datacube/getuserreadhour", date, date, self.MAX_ARTICLE_DAYS
         )
-        return result.get("list", [])
     
     def get_user_share(
         self,
@@ -233,16 +238,9 @@ class StatsManager:
         Returns:
             转发概况数据列表
         """
-        self._validate_date_range(begin_date, end_date, self.MAX_USER_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getusershare",
-            json_data={
-                "begin_date": begin_date,
-                "end_date": end_date
-            }
+        return self._query(
+            "/datacube/getusershare", begin_date, end_date, self.MAX_USER_DAYS
         )
-        return result.get("list", [])
     
     def get_user_share_hour(self, date: str) -> List[Dict[str, Any]]:
         """
@@ -254,16 +252,9 @@ class StatsManager:
         Returns:
             每小时转发数据列表
         """
-        self._validate_date_range(date, date, self.MAX_ARTICLE_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getusersharehour",
-            json_data={
-                "begin_date": date,
-                "end_date": date
-            }
+        return self._query(
+            "/datacube/getusersharehour", date, date, self.MAX_ARTICLE_DAYS
         )
-        return result.get("list", [])
     
     # ==================== 消息数据 ====================
     
@@ -282,16 +273,9 @@ class StatsManager:
         Returns:
             消息发送概况数据列表
         """
-        self._validate_date_range(begin_date, end_date, self.MAX_MESSAGE_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getupstreammsg",
-            json_data={
-                "begin_date": begin_date,
-                "end_date": end_date
-            }
+        return self._query(
+            "/datacube/getupstreammsg", begin_date, end_date, self.MAX_MESSAGE_DAYS
         )
-        return result.get("list", [])
     
     def get_upstream_msg_hour(self, date: str) -> List[Dict[str, Any]]:
         """
@@ -303,16 +287,9 @@ class StatsManager:
         Returns:
             每小时消息发送数据列表
         """
-        self._validate_date_range(date, date, self.MAX_ARTICLE_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getupstreammsghour",
-            json_data={
-                "begin_date": date,
-                "end_date": date
-            }
+        return self._query(
+            "/datacube/getupstreammsghour", date, date, self.MAX_ARTICLE_DAYS
         )
-        return result.get("list", [])
     
     def get_upstream_msg_week(
         self,
@@ -329,16 +306,9 @@ class StatsManager:
         Returns:
             每周消息发送数据列表
         """
-        self._validate_date_range(begin_date, end_date, self.MAX_INTERFACE_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getupstreammsgweek",
-            json_data={
-                "begin_date": begin_date,
-                "end_date": end_date
-            }
+        return self._query(
+            "/datacube/getupstreammsgweek", begin_date, end_date, self.MAX_INTERFACE_DAYS
         )
-        return result.get("list", [])
     
     def get_upstream_msg_month(
         self,
@@ -355,16 +325,9 @@ class StatsManager:
         Returns:
             每月消息发送数据列表
         """
-        self._validate_date_range(begin_date, end_date, self.MAX_INTERFACE_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getupstreammsgmonth",
-            json_data={
-                "begin_date": begin_date,
-                "end_date": end_date
-            }
+        return self._query(
+            "/datacube/getupstreammsgmonth", begin_date, end_date, self.MAX_INTERFACE_DAYS
         )
-        return result.get("list", [])
     
     def get_upstream_msg_dist(
         self,
@@ -381,16 +344,9 @@ class StatsManager:
         Returns:
             消息发送分布数据列表
         """
-        self._validate_date_range(begin_date, end_date, 15)
-        
-        result = self.client.post(
-            "/datacube/getupstreammsgdist",
-            json_data={
-                "begin_date": begin_date,
-                "end_date": end_date
-            }
+        return self._query(
+            "/datacube/getupstreammsgdist", begin_date, end_date, 15
         )
-        return result.get("list", [])
     
     # ==================== 接口数据 ====================
     
@@ -409,16 +365,9 @@ class StatsManager:
         Returns:
             接口调用概要数据列表
         """
-        self._validate_date_range(begin_date, end_date, self.MAX_INTERFACE_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getinterfacesummary",
-            json_data={
-                "begin_date": begin_date,
-                "end_date": end_date
-            }
+        return self._query(
+            "/datacube/getinterfacesummary", begin_date, end_date, self.MAX_INTERFACE_DAYS
         )
-        return result.get("list", [])
     
     def get_interface_summary_hour(self, date: str) -> List[Dict[str, Any]]:
         """
@@ -430,19 +379,34 @@ class StatsManager:
         Returns:
             每小时接口调用数据列表
         """
-        self._validate_date_range(date, date, self.MAX_ARTICLE_DAYS)
-        
-        result = self.client.post(
-            "/datacube/getinterfacesummaryhour",
-            json_data={
-                "begin_date": date,
-                "end_date": date
-            }
+        return self._query(
+            "/datacube/getinterfacesummaryhour", date, date, self.MAX_ARTICLE_DAYS
         )
-        return result.get("list", [])
     
     # ==================== 便捷方法 ====================
     
+    def _fan_out(
+        self,
+        tasks: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        并发请求多个统计接口
+        
+        各接口之间互不依赖，线程在网络 I/O 期间释放 GIL，可相互重叠
+        
+        Args:
+            tasks: (接口路径, 请求体) 列表
+            
+        Returns:
+            与 tasks 顺序一致的数据列表
+        """
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            futures = [
+                executor.submit(self.client.post, endpoint, json_data=body)
+                for endpoint, body in tasks
+            ]
+            return [future.result().get("list", []) for future in futures]
+    
     def get_yesterday_summary(self) -> Dict[str, Any]:
         """
         获取昨日概览数据
@@ -450,14 +414,22 @@ class StatsManager:
         Returns:
             包含用户、阅读、分享数据的汇总
         """
-        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        yesterday = _yesterday().isoformat()
+        body = {"begin_date": yesterday, "end_date": yesterday}
+        
+        user, user_cumulate, article, share = self._fan_out([
+            ("/datacube/getusersummary", body),
+            ("/datacube/getusercumulate", body),
+            ("/datacube/getarticlesummary", body),
+            ("/datacube/getusershare", body),
+        ])
         
         return {
             "date": yesterday,
-            "user": self.get_user_summary(yesterday, yesterday),
-            "user_cumulate": self.get_user_cumulate(yesterday, yesterday),
-            "article": self.get_article_summary(yesterday),
-            "share": self.get_user_share(yesterday, yesterday)
+            "user": user,
+            "user_cumulate": user_cumulate,
+            "article": article,
+            "share": share
         }
     
     def get_week_summary(self) -> Dict[str, Any]:
@@ -467,18 +439,25 @@ class StatsManager:
         Returns:
             包含用户增减和累计数据的汇总
         """
-        end = datetime.now() - timedelta(days=1)
+        end = _yesterday()
         begin = end - timedelta(days=6)
         
-        begin_str = begin.strftime("%Y-%m-%d")
-        end_str = end.strftime("%Y-%m-%d")
+        begin_str = begin.isoformat()
+        end_str = end.isoformat()
+        body = {"begin_date": begin_str, "end_date": end_str}
+        
+        user, user_cumulate, share = self._fan_out([
+            ("/datacube/getusersummary", body),
+            ("/datacube/getusercumulate", body),
+            ("/datacube/getusershare", body),
+        ])
         
         return {
             "begin_date": begin_str,
             "end_date": end_str,
-            "user": self.get_user_summary(begin_str, end_str),
-            "user_cumulate": self.get_user_cumulate(begin_str, end_str),
-            "share": self.get_user_share(begin_str, end_str)
+            "user": user,
+            "user_cumulate": user_cumulate,
+            "share": share
         }
 
 
@@ -7,12 +7,47 @@
 import os
 import time
 import json
-import requests
-from typing import Optional, Dict, Any, BinaryIO
+import tempfile
+import threading
+from typing import Optional, Dict, Any, BinaryIO, Union
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 
 
+# requests 导入耗时较长，延迟到首次创建客户端时导入（见 _import_requests）
+requests = None
+
+# access_token 失效相关的错误码，遇到时刷新 token 并重试
+TOKEN_ERRCODES = frozenset({40001, 40014, 42001})
+
+# 是否已自动查找并加载过 .env 文件（进程内只查找一次）
+_dotenv_loaded = False
+
+
+def _import_requests():
+    """导入并缓存 requests 模块"""
+    global requests
+    if requests is None:
+        import requests as _requests
+        requests = _requests
+    return requests
+
+
+def _ensure_dotenv(env_file: Optional[str] = None) -> None:
+    """
+    加载 .env 文件
+    
+    未指定 env_file 时从当前目录向上查找，进程内只执行一次；
+    显式指定 env_file 时总是重新加载
+    """
+    global _dotenv_loaded
+    if env_file:
+        load_dotenv(env_file)
+    elif not _dotenv_loaded:
+        load_dotenv(find_dotenv(usecwd=True))
+        _dotenv_loaded = True
+
+
 class WeChatAPIError(Exception):
     """微信 API 错误"""
     def __init__(self, errcode: int, errmsg: str):
@@ -24,8 +59,27 @@ class WeChatAPIError(Exception):
 class WeChatClient:
     """微信公众号 API 客户端"""
     
+    __slots__ = (
+        "appid",
+        "appsecret",
+        "token_cache_dir",
+        "_access_token",
+        "_token_expires_at",
+        "_token_valid_until",
+        "_token_lock",
+        "_session",
+    )
+    
     BASE_URL = "https://api.weixin.qq.com"
     TOKEN_CACHE_FILE = ".wechat_token_cache.json"
+    # 连接池大小，需不小于并发上传线程数
+    POOL_MAXSIZE = 16
+    # token 提前失效的缓冲时间（秒）
+    TOKEN_EXPIRY_BUFFER = 300
+    # 网络错误及 5xx 响应的重试次数（POST 仅在连接建立失败时重试）
+    MAX_RETRIES = 3
+    # 流式下载时每次写入的块大小
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
     
     def __init__(
         self,
@@ -44,7 +98,7 @@ class WeChatClient:
             env_file: .env 文件路径，默认自动查找
         """
         # 自动加载 .env 文件（从当前目录向上查找）
-        load_dotenv(env_file or find_dotenv(usecwd=True))
+        _ensure_dotenv(env_file)
         
         self.appid = appid or os.environ.get("WECHAT_APPID")
         self.appsecret = appsecret or os.environ.get("WECHAT_APPSECRET")
@@ -57,11 +111,41 @@ class WeChatClient:
         
         self.token_cache_dir = Path(token_cache_dir or ".")
         self._access_token: Optional[str] = None
+        # 过期时间：墙上时间用于缓存文件，单调时钟用于进程内有效性判断
         self._token_expires_at: float = 0
+        self._token_valid_until: float = 0
+        # 多线程并发请求时保证同一时刻只有一个线程刷新 token
+        self._token_lock = threading.Lock()
+
+        # 复用 HTTP 连接（keep-alive），避免每次请求重新建立 TCP/TLS 连接
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        self._session = _import_requests().Session()
+        retry = Retry(
+            total=self.MAX_RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=(500, 502, 503, 504),
+            # 重试耗尽后返回最后一次响应，交由 errcode/JSON 处理，而不是抛 RetryError
+            raise_on_status=False
+        )
+        self._session.mount(
+            "https://",
+            HTTPAdapter(pool_maxsize=self.POOL_MAXSIZE, max_retries=retry)
+        )
         
         # 尝试从缓存加载 token
         self._load_token_cache()
     
+    def close(self) -> None:
+        """关闭底层 HTTP 连接"""
+        self._session.close()
+    
+    def __enter__(self) -> "WeChatClient":
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
     def _get_cache_path(self) -> Path:
         """获取 token 缓存文件路径"""
         return self.token_cache_dir / self.TOKEN_CACHE_FILE
@@ -74,37 +158,71 @@ class WeChatClient:
                 with open(cache_path, "r") as f:
                     cache = json.load(f)
                     if cache.get("appid") == self.appid:
-                        self._access_token = cache.get("access_token")
-                        self._token_expires_at = cache.get("expires_at", 0)
+                        self._set_token(
+                            cache.get("access_token"),
+                            cache.get("expires_at", 0)
+                        )
             except (json.JSONDecodeError, IOError):
                 pass
     
     def _save_token_cache(self) -> None:
-        """保存 token 到缓存"""
+        """
+        保存 token 到缓存
+
+        每次写入使用独立的临时文件（同进程内多个客户端/线程也不会互相覆盖），
+        落盘后再原子替换，避免写入中断或并发写入导致缓存损坏
+        """
         cache_path = self._get_cache_path()
         try:
-            with open(cache_path, "w") as f:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=cache_path.parent, prefix=f"{cache_path.name}.", suffix=".tmp"
+            )
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "w") as f:
                 json.dump({
                     "appid": self.appid,
                     "access_token": self._access_token,
                     "expires_at": self._token_expires_at
                 }, f)
-        except IOError:
-            pass
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    
+    def _set_token(self, token: Optional[str], expires_at: float) -> None:
+        """设置 token 及其过期时间（expires_at 为墙上时间戳）"""
+        self._access_token = token
+        self._token_expires_at = expires_at
+        self._token_valid_until = (
+            time.monotonic() + (expires_at - time.time())
+            - self.TOKEN_EXPIRY_BUFFER
+        )
     
     def _is_token_valid(self) -> bool:
-        """检查 token 是否有效（预留 5 分钟缓冲）"""
+        """检查 token 是否有效（预留 5 分钟缓冲，不受系统时间调整影响）"""
         return (
-            self._access_token is not None 
-            and time.time() < self._token_expires_at - 300
+            self._access_token is not None
+            and time.monotonic() < self._token_valid_until
         )
     
-    def get_access_token(self, force_refresh: bool = False) -> str:
+    def get_access_token(
+        self,
+        force_refresh: bool = False,
+        stale_token: Optional[str] = None
+    ) -> str:
         """
         获取 access_token
         
         Args:
             force_refresh: 是否强制刷新
+            stale_token: 被接口判定失效的 token（可选）；强制刷新时若当前
+                token 已不是它，说明其他线程已完成刷新，直接复用
             
         Returns:
             access_token 字符串
@@ -112,24 +230,34 @@ class WeChatClient:
         if not force_refresh and self._is_token_valid():
             return self._access_token
         
-        url = f"{self.BASE_URL}/cgi-bin/token"
-        params = {
-            "grant_type": "client_credential",
-            "appid": self.appid,
-            "secret": self.appsecret
-        }
-        
-        resp = requests.get(url, params=params)
-        result = resp.json()
-        
-        if "errcode" in result and result["errcode"] != 0:
-            raise WeChatAPIError(result["errcode"], result.get("errmsg", ""))
-        
-        self._access_token = result["access_token"]
-        self._token_expires_at = time.time() + result.get("expires_in", 7200)
-        self._save_token_cache()
-        
-        return self._access_token
+        with self._token_lock:
+            # 等待锁期间其他线程可能已完成刷新
+            if self._is_token_valid() and (
+                not force_refresh
+                or (stale_token is not None and self._access_token != stale_token)
+            ):
+                return self._access_token
+            
+            url = f"{self.BASE_URL}/cgi-bin/token"
+            params = {
+                "grant_type": "client_credential",
+                "appid": self.appid,
+                "secret": self.appsecret
+            }
+            
+            resp = self._session.get(url, params=params)
+            result = resp.json()
+            
+            if "errcode" in result and result["errcode"] != 0:
+                raise WeChatAPIError(result["errcode"], result.get("errmsg", ""))
+            
+            self._set_token(
+                result["access_token"],
+                time.time() + result.get("expires_in", 7200)
+            )
+            self._save_token_cache()
+            
+            return self._access_token
     
     def request(
         self,
@@ -158,42 +286,53 @@ class WeChatClient:
         """
         url = f"{self.BASE_URL}{endpoint}"
 
-        # 添加 access_token
-        params = params or {}
-        params["access_token"] = self.get_access_token()
+        # 复制一份 params，不修改调用方传入的 dict；重试时只替换 access_token
+        params = dict(params or {})
 
-        # 处理 JSON 数据，确保中文不被转义
+        # 处理 JSON 数据，确保中文不被转义（只序列化一次，重试时复用）
         headers = {}
         if json_data is not None:
             data = json.dumps(json_data, ensure_ascii=False).encode('utf-8')
             headers['Content-Type'] = 'application/json'
 
-        # 发送请求
-        resp = requests.request(
-            method=method,
-            url=url,
-            params=params,
-            headers=headers if headers else None,
-            files=files,
-            data=data
-        )
-        
-        # 处理响应
-        result = resp.json()
-        
-        # 检查错误
-        errcode = result.get("errcode", 0)
-        if errcode != 0:
-            # token 过期，自动重试
-            if errcode in (40001, 40014, 42001) and auto_retry:
-                self.get_access_token(force_refresh=True)
-                return self.request(
-                    method, endpoint, params, json_data, files, data,
-                    auto_retry=False
-                )
+        for attempt in range(2):
+            if attempt:
+                self._rewind_files(files)
+            # 重试时带上失效的 token，多个线程同时遇到 token 错误只刷新一次
+            params["access_token"] = self.get_access_token(
+                force_refresh=attempt > 0,
+                stale_token=params.get("access_token")
+            )
+
+            # 发送请求
+            resp = self._session.request(
+                method=method,
+                url=url,
+                params=params,
+                headers=headers if headers else None,
+                files=files,
+                data=data
+            )
+            
+            # 处理响应
+            result = resp.json()
+            
+            # 检查错误
+            errcode = result.get("errcode", 0)
+            if errcode == 0:
+                return result
+            # token 过期，刷新后自动重试一次
+            if attempt == 0 and auto_retry and errcode in TOKEN_ERRCODES:
+                continue
             raise WeChatAPIError(errcode, result.get("errmsg", ""))
-        
-        return result
+    
+    @staticmethod
+    def _rewind_files(files: Optional[Dict[str, Any]]) -> None:
+        """将上传文件指针复位，以便重试时重新发送完整内容"""
+        for value in (files or {}).values():
+            f = value[1] if isinstance(value, tuple) else value
+            if hasattr(f, "seek"):
+                f.seek(0)
     
     def get(
         self,
@@ -240,34 +379,50 @@ class WeChatClient:
         self,
         endpoint: str,
         params: Optional[Dict[str, Any]] = None,
-        json_data: Optional[Dict[str, Any]] = None
-    ) -> bytes:
+        json_data: Optional[Dict[str, Any]] = None,
+        save_path: Optional[str] = None
+    ) -> Union[bytes, str]:
         """
         下载文件
         
+        Args:
+            endpoint: API 端点
+            params: URL 参数
+            json_data: JSON 请求体
+            save_path: 保存路径（可选），指定时分块流式写入文件，不在内存中保留完整内容
+        
         Returns:
-            文件二进制内容
+            文件二进制内容；指定 save_path 时返回 save_path
         """
         url = f"{self.BASE_URL}{endpoint}"
-        params = params or {}
-        params["access_token"] = self.get_access_token()
+        params = {**(params or {}), "access_token": self.get_access_token()}
         
+        # 流式请求：先根据响应头判断是否为错误，再决定如何读取响应体
         if json_data:
-            resp = requests.post(url, params=params, json=json_data)
+            resp = self._session.post(
+                url, params=params, json=json_data, stream=True
+            )
         else:
-            resp = requests.get(url, params=params)
+            resp = self._session.get(url, params=params, stream=True)
         
-        # 检查是否是 JSON 错误响应
-        content_type = resp.headers.get("Content-Type", "")
-        if "application/json" in content_type or "text/plain" in content_type:
-            try:
-                result = resp.json()
-                if "errcode" in result and result["errcode"] != 0:
-                    raise WeChatAPIError(result["errcode"], result.get("errmsg", ""))
-            except json.JSONDecodeError:
-                pass
-        
-        return resp.content
+        with resp:
+            # 检查是否是 JSON 错误响应（体积很小，直接读取）
+            content_type = resp.headers.get("Content-Type", "")
+            if "application/json" in content_type or "text/plain" in content_type:
+                try:
+                    result = resp.json()
+                    if "errcode" in result and result["errcode"] != 0:
+                        raise WeChatAPIError(result["errcode"], result.get("errmsg", ""))
+                except json.JSONDecodeError:
+                    pass
+            
+            if save_path is None:
+                return resp.content
+            
+            with open(save_path, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=self.DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+            return save_path
 
 
 # 便捷函数
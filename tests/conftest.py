@@ -4,13 +4,30 @@ pytest 配置和共享 fixtures
 
 import os
 import sys
+import time
 import pytest
-from unittest.mock import MagicMock, patch
+import responses
+from types import SimpleNamespace
+from unittest.mock import patch
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+# ==================== Mock Helpers ====================
+
+def make_response(data):
+    """构造只需支持 .json() 的轻量模拟响应"""
+    return SimpleNamespace(json=lambda: data)
+
+
+# 默认的 token 响应，各测试共享
+TOKEN_RESPONSE = make_response({
+    "access_token": "test_token",
+    "expires_in": 7200
+})
+
+
 # ==================== Mock Fixtures ====================
 
 @pytest.fixture
@@ -19,9 +36,14 @@ def mock_access_token():
     return "mock_access_token_1234567890"
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def mock_env_vars():
-    """模拟环境变量"""
+    """
+    模拟环境变量
+
+    各测试使用的凭证相同，按模块只设置一次；
+    需要缺少凭证的测试自行用 monkeypatch.delenv 删除对应变量
+    """
     with patch.dict(os.environ, {
         "WECHAT_APPID": "test_appid",
         "WECHAT_APPSECRET": "test_appsecret"
@@ -29,6 +51,14 @@ def mock_env_vars():
         yield
 
 
+@pytest.fixture
+def mock_requests(mock_env_vars):
+    """patch scripts.wechat_client.requests，Session() 返回 mock 本身"""
+    with patch("scripts.wechat_client.requests") as mock_requests:
+        mock_requests.Session.return_value = mock_requests
+        yield mock_requests
+
+
 @pytest.fixture
 def mock_token_response(mock_access_token):
     """模拟获取 token 的响应"""
@@ -38,23 +68,74 @@ def mock_token_response(mock_access_token):
     }
 
 
+@pytest.fixture(scope="session")
+def fake_image(tmp_path_factory):
+    """
+    会话级共享的假图片文件
+
+    仅需要一个存在且可读的文件时使用；内容会被校验的测试自行创建文件
+    """
+    path = tmp_path_factory.mktemp("shared") / "image.png"
+    path.write_bytes(b"fake image data")
+    return path
+
+
+@pytest.fixture(scope="session")
+def static_env_file(tmp_path_factory):
+    """会话级共享的 .env 文件（内容固定，只写一次）"""
+    path = tmp_path_factory.mktemp("env") / ".env"
+    path.write_text('TEST_VAR="test_value"\n')
+    return path
+
+
+@pytest.fixture(scope="session")
+def patched_client(tmp_path_factory):
+    """
+    会话级共享的 WeChatClient
+
+    已预置有效 token，测试过程中不会发起 token 请求；
+    配合 wechat_api 在适配器层拦截 API 请求
+    """
+    with patch.dict(os.environ, {
+        "WECHAT_APPID": "test_appid",
+        "WECHAT_APPSECRET": "test_appsecret"
+    }):
+        from scripts import WeChatClient
+        client = WeChatClient(
+            token_cache_dir=str(tmp_path_factory.mktemp("token_cache"))
+        )
+    client._set_token("test_token", time.time() + 3600)
+    yield client
+    client.close()
+
+
 @pytest.fixture
-def mock_client(mock_env_vars, mock_access_token):
-    """创建模拟的 WeChatClient"""
-    with patch("scripts.wechat_client.requests") as mock_requests:
+def wechat_api():
+    """
+    在适配器层拦截 HTTP 请求
+
+    未注册的请求会抛出 ConnectionError，注册了但未被调用的请求会使测试失败
+    """
+    with responses.RequestsMock() as rsps:
+        yield rsps
+
+
+@pytest.fixture
+def mock_client(mock_env_vars, mock_access_token, tmp_path):
+    """创建模拟的 WeChatClient（在适配器层拦截 HTTP 请求）"""
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
         # 模拟 token 请求
-        mock_response = MagicMock()
-        mock_response.json.return_value = {
-            "access_token": mock_access_token,
-            "expires_in": 7200
-        }
-        mock_requests.get.return_value = mock_response
-        mock_requests.request.return_value = mock_response
+        rsps.get(
+            "https://api.weixin.qq.com/cgi-bin/token",
+            json={
+                "access_token": mock_access_token,
+                "expires_in": 7200
+            }
+        )
 
         from scripts import WeChatClient
-        client = WeChatClient()
-        client._mock_requests = mock_requests
-        yield client
+        # 使用临时目录，避免读写仓库中的 token 缓存
+        yield WeChatClient(token_cache_dir=str(tmp_path))
 
 
 # ==================== E2E Fixtures ====================
@@ -69,11 +150,13 @@ def pytest_configure(config):
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def real_client():
     """
     创建真实的 WeChatClient（用于 E2E 测试）
     需要设置 WECHAT_APPID 和 WECHAT_APPSECRET 环境变量
+
+    整个测试会话共享同一个客户端，access_token 只需获取一次
     """
     from dotenv import load_dotenv
     load_dotenv()
@@ -85,24 +168,25 @@ def real_client():
         pytest.skip("需要设置 WECHAT_APPID 和 WECHAT_APPSECRET 环境变量")
 
     from scripts import WeChatClient
-    return WeChatClient()
+    with WeChatClient() as client:
+        yield client
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def real_material_manager(real_client):
     """创建真实的 MaterialManager"""
     from scripts import MaterialManager
     return MaterialManager(real_client)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def real_draft_manager(real_client):
     """创建真实的 DraftManager"""
     from scripts import DraftManager
     return DraftManager(real_client)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def real_stats_manager(real_client):
     """创建真实的 StatsManager"""
     from scripts import StatsManager
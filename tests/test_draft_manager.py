@@ -3,71 +3,57 @@ DraftManager 单元测试
 """
 
 import pytest
-from unittest.mock import patch, MagicMock
+from responses import matchers
+
+from scripts import DraftManager, create_simple_article
+
+API_BASE = "https://api.weixin.qq.com"
 
 
 class TestDraftManagerInit:
     """测试草稿管理器初始化"""
 
     @pytest.mark.unit
-    def test_init_with_client(self, mock_client):
+    def test_init_with_client(self, patched_client):
         """测试通过客户端初始化"""
-        from scripts import DraftManager
-        dm = DraftManager(mock_client)
-        assert dm.client == mock_client
+        dm = DraftManager(patched_client)
+        assert dm.client == patched_client
 
 
 class TestArticleValidation:
     """测试文章验证"""
 
     @pytest.mark.unit
-    def test_validate_article_missing_title(self, mock_client):
-        """测试缺少标题"""
-        from scripts import DraftManager
-        dm = DraftManager(mock_client)
-
-        with pytest.raises(ValueError, match="缺少必填字段: title"):
-            dm._validate_article({"content": "<p>test</p>"})
-
-    @pytest.mark.unit
-    def test_validate_article_missing_content(self, mock_client):
-        """测试缺少内容"""
-        from scripts import DraftManager
-        dm = DraftManager(mock_client)
-
-        with pytest.raises(ValueError, match="缺少必填字段: content"):
-            dm._validate_article({"title": "test"})
-
-    @pytest.mark.unit
-    def test_validate_article_title_too_long(self, mock_client):
-        """测试标题过长"""
-        from scripts import DraftManager
-        dm = DraftManager(mock_client)
-
-        with pytest.raises(ValueError, match="标题长度不能超过32个字符"):
-            dm._validate_article({
-                "title": "x" * 33,
-                "content": "<p>test</p>"
-            })
-
-    @pytest.mark.unit
-    def test_validate_article_author_too_long(self, mock_client):
-        """测试作者名过长"""
-        from scripts import DraftManager
-        dm = DraftManager(mock_client)
-
-        with pytest.raises(ValueError, match="作者名长度不能超过16个字符"):
-            dm._validate_article({
-                "title": "test",
-                "content": "<p>test</p>",
-                "author": "x" * 17
-            })
-
-    @pytest.mark.unit
-    def test_validate_article_success(self, mock_client):
+    @pytest.mark.parametrize("article, error", [
+        ({"content": "<p>test</p>"}, "缺少必填字段: title"),
+        ({"title": "test"}, "缺少必填字段: content"),
+        ({"title": "x" * 33, "content": "<p>test</p>"}, "标题长度不能超过32个字符"),
+        (
+            {"title": "test", "content": "<p>test</p>", "author": "x" * 17},
+            "作者名长度不能超过16个字符"
+        ),
+        (
+            {"title": "test", "content": "<p>test</p>", "digest": "x" * 129},
+            "摘要长度不能超过128个字符"
+        ),
+    ], ids=[
+        "missing_title",
+        "missing_content",
+        "title_too_long",
+        "author_too_long",
+        "digest_too_long",
+    ])
+    def test_validate_article_errors(self, patched_client, article, error):
+        """测试文章字段缺失或超长"""
+        dm = DraftManager(patched_client)
+
+        with pytest.raises(ValueError, match=error):
+            dm._validate_article(article)
+
+    @pytest.mark.unit
+    def test_validate_article_success(self, patched_client):
         """测试验证通过"""
-        from scripts import DraftManager
-        dm = DraftManager(mock_client)
+        dm = DraftManager(patched_client)
 
         article = {
             "title": "测试标题",
@@ -82,212 +68,151 @@ class TestDraftCRUD:
     """测试草稿增删改查"""
 
     @pytest.mark.unit
-    def test_create_draft(self, mock_env_vars):
+    def test_create_draft(self, patched_client, wechat_api):
         """测试创建草稿"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            create_response = MagicMock()
-            create_response.json.return_value = {
-                "errcode": 0,
-                "media_id": "draft_media_id"
-            }
-
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = create_response
-
-            from scripts import WeChatClient, DraftManager
-            client = WeChatClient()
-            dm = DraftManager(client)
+        articles = [{
+            "title": "测试文章",
+            "content": "<p>内容</p>",
+            "thumb_media_id": "cover_id"
+        }]
+        wechat_api.post(
+            f"{API_BASE}/cgi-bin/draft/add",
+            json={"errcode": 0, "media_id": "draft_media_id"},
+            match=[
+                matchers.query_param_matcher({"access_token": "test_token"}),
+                matchers.json_params_matcher({"articles": articles}),
+            ]
+        )
 
-            articles = [{
-                "title": "测试文章",
-                "content": "<p>内容</p>",
-                "thumb_media_id": "cover_id"
-            }]
+        dm = DraftManager(patched_client)
 
-            media_id = dm.create_draft(articles)
-            assert media_id == "draft_media_id"
+        media_id = dm.create_draft(articles)
+        assert media_id == "draft_media_id"
+        # 已预置 token，只发起了创建草稿请求
+        assert len(wechat_api.calls) == 1
 
     @pytest.mark.unit
-    def test_create_draft_empty_articles(self, mock_client):
+    def test_create_draft_empty_articles(self, patched_client):
         """测试创建空草稿"""
-        from scripts import DraftManager
-        dm = DraftManager(mock_client)
+        dm = DraftManager(patched_client)
 
         with pytest.raises(ValueError, match="文章列表不能为空"):
             dm.create_draft([])
 
     @pytest.mark.unit
-    def test_get_draft(self, mock_env_vars):
+    def test_get_draft(self, patched_client, wechat_api):
         """测试获取草稿"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            get_response = MagicMock()
-            get_response.json.return_value = {
+        wechat_api.post(
+            f"{API_BASE}/cgi-bin/draft/get",
+            json={
                 "errcode": 0,
                 "news_item": [{
                     "title": "文章标题",
                     "content": "<p>内容</p>"
                 }]
-            }
-
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = get_response
-
-            from scripts import WeChatClient, DraftManager
-            client = WeChatClient()
-            dm = DraftManager(client)
-
-            result = dm.get_draft("test_media_id")
-            assert "news_item" in result
-            assert result["news_item"][0]["title"] == "文章标题"
-
-    @pytest.mark.unit
-    def test_delete_draft(self, mock_env_vars):
-        """测试删除草稿"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            delete_response = MagicMock()
-            delete_response.json.return_value = {"errcode": 0}
+            },
+            match=[matchers.json_params_matcher({"media_id": "test_media_id"})]
+        )
 
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = delete_response
+        dm = DraftManager(patched_client)
+
+        result = dm.get_draft("test_media_id")
+        assert "news_item" in result
+        assert result["news_item"][0]["title"] == "文章标题"
+
+    @pytest.mark.unit
+    @pytest.mark.parametrize("method, args, endpoint, body, response, expected", [
+        (
+            "delete_draft",
+            ("test_media_id",),
+            "/cgi-bin/draft/delete",
+            {"media_id": "test_media_id"},
+            {"errcode": 0},
+            True
+        ),
+        (
+            "publish_draft",
+            ("draft_media_id",),
+            "/cgi-bin/freepublish/submit",
+            {"media_id": "draft_media_id"},
+            {"errcode": 0, "publish_id": "publish_123"},
+            "publish_123"
+        ),
+    ])
+    def test_simple_calls(
+        self, patched_client, wechat_api,
+        method, args, endpoint, body, response, expected
+    ):
+        """测试删除草稿、发布草稿"""
+        wechat_api.post(
+            f"{API_BASE}{endpoint}",
+            json=response,
+            match=[matchers.json_params_matcher(body)]
+        )
 
-            from scripts import WeChatClient, DraftManager
-            client = WeChatClient()
-            dm = DraftManager(client)
+        dm = DraftManager(patched_client)
 
-            result = dm.delete_draft("test_media_id")
-            assert result is True
+        assert getattr(dm, method)(*args) == expected
 
     @pytest.mark.unit
-    def test_get_draft_count(self, mock_env_vars):
+    def test_get_draft_count(self, patched_client, wechat_api):
         """测试获取草稿数量"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            count_response = MagicMock()
-            count_response.json.return_value = {
-                "errcode": 0,
-                "total_count": 15
-            }
-
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = count_response
+        wechat_api.get(
+            f"{API_BASE}/cgi-bin/draft/count",
+            json={"errcode": 0, "total_count": 15}
+        )
 
-            from scripts import WeChatClient, DraftManager
-            client = WeChatClient()
-            dm = DraftManager(client)
+        dm = DraftManager(patched_client)
 
-            count = dm.get_draft_count()
-            assert count == 15
+        assert dm.get_draft_count() == 15
 
     @pytest.mark.unit
-    def test_list_drafts(self, mock_env_vars):
+    def test_list_drafts(self, patched_client, wechat_api):
         """测试获取草稿列表"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            list_response = MagicMock()
-            list_response.json.return_value = {
+        wechat_api.post(
+            f"{API_BASE}/cgi-bin/draft/batchget",
+            json={
                 "errcode": 0,
                 "total_count": 30,
                 "item_count": 20,
                 "item": [{"media_id": "id1"}, {"media_id": "id2"}]
-            }
-
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = list_response
+            },
+            match=[matchers.json_params_matcher({
+                "offset": 0,
+                "count": 20,
+                "no_content": 0
+            })]
+        )
 
-            from scripts import WeChatClient, DraftManager
-            client = WeChatClient()
-            dm = DraftManager(client)
+        dm = DraftManager(patched_client)
 
-            result = dm.list_drafts(offset=0, count=20)
-            assert result["total_count"] == 30
-            assert len(result["item"]) == 2
+        result = dm.list_drafts(offset=0, count=20)
+        assert result["total_count"] == 30
+        assert len(result["item"]) == 2
 
 
 class TestPublishing:
     """测试发布功能"""
 
     @pytest.mark.unit
-    def test_publish_draft(self, mock_env_vars):
-        """测试发布草稿"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            publish_response = MagicMock()
-            publish_response.json.return_value = {
-                "errcode": 0,
-                "publish_id": "publish_123"
-            }
-
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = publish_response
-
-            from scripts import WeChatClient, DraftManager
-            client = WeChatClient()
-            dm = DraftManager(client)
-
-            publish_id = dm.publish_draft("draft_media_id")
-            assert publish_id == "publish_123"
-
-    @pytest.mark.unit
-    def test_get_publish_status(self, mock_env_vars):
+    def test_get_publish_status(self, patched_client, wechat_api):
         """测试查询发布状态"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            status_response = MagicMock()
-            status_response.json.return_value = {
+        wechat_api.post(
+            f"{API_BASE}/cgi-bin/freepublish/get",
+            json={
                 "errcode": 0,
                 "publish_id": "publish_123",
                 "publish_status": 0,
                 "article_id": "article_456"
-            }
-
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = status_response
+            },
+            match=[matchers.json_params_matcher({"publish_id": "publish_123"})]
+        )
 
-            from scripts import WeChatClient, DraftManager
-            client = WeChatClient()
-            dm = DraftManager(client)
+        dm = DraftManager(patched_client)
 
-            status = dm.get_publish_status("publish_123")
-            assert status["publish_status"] == 0
-            assert status["article_id"] == "article_456"
+        status = dm.get_publish_status("publish_123")
+        assert status["publish_status"] == 0
+        assert status["article_id"] == "article_456"
 
 
 class TestHelperFunctions:
@@ -296,8 +221,6 @@ class TestHelperFunctions:
     @pytest.mark.unit
     def test_create_simple_article(self):
         """测试创建简单文章"""
-        from scripts import create_simple_article
-
         article = create_simple_article(
             title="测试标题",
             content="<p>测试内容</p>",
@@ -315,8 +238,6 @@ class TestHelperFunctions:
     @pytest.mark.unit
     def test_create_simple_article_minimal(self):
         """测试创建最小文章"""
-        from scripts import create_simple_article
-
         article = create_simple_article(
             title="标题",
             content="<p>内容</p>",
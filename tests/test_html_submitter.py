@@ -2,9 +2,12 @@
 HtmlSubmitter 单元测试
 """
 
+import os
 import pytest
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
+
+from .conftest import TOKEN_RESPONSE, make_response
 
 
 class TestParseFileUri:
@@ -46,6 +49,40 @@ class TestParseFileUri:
         assert _parse_file_uri(uri) == "C:/Users/test/图片.png"
 
 
+class TestReadHtml:
+    """测试 HTML 文件读取"""
+
+    @pytest.mark.unit
+    def test_read_html_utf8(self, tmp_path):
+        """测试读取 UTF-8 HTML 文件"""
+        from scripts.html_submitter import _read_html
+
+        html_file = tmp_path / "test.html"
+        html_file.write_bytes("<title>中文标题</title>".encode("utf-8"))
+
+        assert _read_html(html_file) == "<title>中文标题</title>"
+
+    @pytest.mark.unit
+    def test_read_html_empty(self, tmp_path):
+        """测试读取空文件"""
+        from scripts.html_submitter import _read_html
+
+        html_file = tmp_path / "empty.html"
+        html_file.write_bytes(b"")
+
+        assert _read_html(html_file) == ""
+
+    @pytest.mark.unit
+    def test_read_html_keeps_crlf(self, tmp_path):
+        """测试保留 CRLF 换行符"""
+        from scripts.html_submitter import _read_html
+
+        html_file = tmp_path / "crlf.html"
+        html_file.write_bytes(b"<p>a</p>\r\n<p>b</p>\r\n")
+
+        assert _read_html(html_file) == "<p>a</p>\r\n<p>b</p>\r\n"
+
+
 class TestExtractLocalImages:
     """测试本地图片路径提取"""
 
@@ -91,6 +128,23 @@ class TestExtractLocalImages:
         assert len(images) == 1
         assert "file:///" in images[0][0]
 
+    @pytest.mark.unit
+    def test_extract_no_images(self, tmp_path):
+        """测试纯文字 HTML 返回空列表"""
+        from scripts.html_submitter import _extract_local_images
+
+        html = '<p>没有图片的文章</p><a href="image.png">链接</a>'
+        assert _extract_local_images(html, tmp_path) == []
+
+    @pytest.mark.unit
+    def test_extract_images_uppercase_tag(self, tmp_path):
+        """测试大写 IMG 标签"""
+        from scripts.html_submitter import _extract_local_images
+
+        html = '<IMG SRC="images/photo.jpg" />'
+        images = _extract_local_images(html, tmp_path)
+        assert len(images) == 1
+
     @pytest.mark.unit
     def test_extract_images_with_single_quotes(self, tmp_path):
         """测试单引号的 src 属性"""
@@ -101,6 +155,16 @@ class TestExtractLocalImages:
         images = _extract_local_images(html, tmp_path)
         assert len(images) == 1
 
+    @pytest.mark.unit
+    def test_extract_images_ignores_data_src(self, tmp_path):
+        """测试 data-src 等属性不会被当作 src"""
+        from scripts.html_submitter import _extract_local_images
+
+        html = '<img data-src="lazy.png" src = "images/photo.jpg" alt="x" />'
+
+        images = _extract_local_images(html, tmp_path)
+        assert images == [("images/photo.jpg", str(tmp_path / "images/photo.jpg"))]
+
 
 class TestExtractTitle:
     """测试标题提取"""
@@ -121,6 +185,14 @@ class TestExtractTitle:
         html = "<title>  标题带空格  </title>"
         assert _extract_title(html) == "标题带空格"
 
+    @pytest.mark.unit
+    def test_extract_title_with_attributes(self):
+        """测试带属性的 title 标签"""
+        from scripts.html_submitter import _extract_title
+
+        html = '<html><head><title lang="zh">带属性标题</title></head></html>'
+        assert _extract_title(html) == "带属性标题"
+
     @pytest.mark.unit
     def test_extract_title_missing(self):
         """测试缺少标题"""
@@ -151,6 +223,14 @@ class TestExtractBody:
         assert "<div>内容</div>" in body
         assert "class=" not in body  # body 标签属性不应包含
 
+    @pytest.mark.unit
+    def test_extract_body_with_closing_tag_in_comment(self):
+        """测试注释中的 </body> 不会截断正文"""
+        from scripts.html_submitter import _extract_body
+
+        html = "<html><BODY><p>前</p><!-- </body> --><p>后</p></BODY></html>"
+        assert _extract_body(html) == "<p>前</p><!-- </body> --><p>后</p>"
+
     @pytest.mark.unit
     def test_extract_body_missing(self):
         """测试缺少 body 标签"""
@@ -160,6 +240,39 @@ class TestExtractBody:
         assert _extract_body(html) == html
 
 
+class TestReplaceImageSrcs:
+    """测试图片 src 替换"""
+
+    @pytest.mark.unit
+    def test_replace_mixed_quotes(self):
+        """测试单双引号混用时均能替换"""
+        from scripts.html_submitter import _replace_image_srcs
+
+        html = '<img src="a.png" /><p>text</p><img src=\'b.png\' />'
+        result = _replace_image_srcs(html, {
+            "a.png": "https://mmbiz.qpic.cn/a.png",
+            "b.png": "https://mmbiz.qpic.cn/b.png",
+        })
+
+        assert result == (
+            '<img src="https://mmbiz.qpic.cn/a.png" /><p>text</p>'
+            "<img src='https://mmbiz.qpic.cn/b.png' />"
+        )
+
+    @pytest.mark.unit
+    def test_replace_keeps_unmapped_and_text(self):
+        """测试未映射的 src 和正文中的同名文本保持不变"""
+        from scripts.html_submitter import _replace_image_srcs
+
+        html = '<p>src="a.png"</p><img src="a.png" /><img src="https://x.com/c.png" />'
+        result = _replace_image_srcs(html, {"a.png": "https://mmbiz.qpic.cn/a.png"})
+
+        assert result == (
+            '<p>src="a.png"</p><img src="https://mmbiz.qpic.cn/a.png" />'
+            '<img src="https://x.com/c.png" />'
+        )
+
+
 class TestSubmitHtmlDraft:
     """测试 HTML 草稿提交"""
 
@@ -192,7 +305,7 @@ class TestSubmitHtmlDraft:
             )
 
     @pytest.mark.unit
-    def test_submit_missing_title(self, mock_client, tmp_path):
+    def test_submit_missing_title(self, mock_client, tmp_path, fake_image):
         """测试缺少标题"""
         from scripts.html_submitter import submit_html_draft, HtmlSubmitError
 
@@ -200,89 +313,70 @@ class TestSubmitHtmlDraft:
         html_file = tmp_path / "test.html"
         html_file.write_text("<html><body>Content</body></html>")
 
-        cover_file = tmp_path / "cover.png"
-        cover_file.write_bytes(b"fake image")
-
         with pytest.raises(HtmlSubmitError, match="未提供标题"):
             submit_html_draft(
                 html_path=str(html_file),
-                cover_path=str(cover_file),
+                cover_path=str(fake_image),
                 client=mock_client
             )
 
     @pytest.mark.unit
-    def test_submit_with_explicit_title(self, mock_env_vars, tmp_path):
+    def test_submit_with_explicit_title(self, mock_env_vars, tmp_path, fake_image):
         """测试使用显式指定的标题"""
         with patch("scripts.wechat_client.requests") as mock_requests:
+            mock_requests.Session.return_value = mock_requests
             # 设置 mock 响应
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            upload_response = MagicMock()
-            upload_response.json.return_value = {
+            upload_response = make_response({
                 "errcode": 0,
                 "media_id": "cover_media_id"
-            }
+            })
 
-            draft_response = MagicMock()
-            draft_response.json.return_value = {
+            draft_response = make_response({
                 "errcode": 0,
                 "media_id": "draft_media_id"
-            }
+            })
 
-            mock_requests.get.return_value = token_response
+            mock_requests.get.return_value = TOKEN_RESPONSE
             mock_requests.request.side_effect = [upload_response, draft_response]
 
             # 创建测试文件（无 title 标签）
             html_file = tmp_path / "test.html"
             html_file.write_text("<html><body><p>Content</p></body></html>")
 
-            cover_file = tmp_path / "cover.png"
-            cover_file.write_bytes(b"fake image")
-
+            from scripts import WeChatClient
             from scripts.html_submitter import submit_html_draft
 
             media_id = submit_html_draft(
                 html_path=str(html_file),
-                cover_path=str(cover_file),
+                cover_path=str(fake_image),
+                client=WeChatClient(token_cache_dir=str(tmp_path)),
                 title="显式标题"
             )
 
             assert media_id == "draft_media_id"
 
     @pytest.mark.unit
-    def test_submit_full_workflow(self, mock_env_vars, tmp_path):
+    def test_submit_full_workflow(self, mock_env_vars, tmp_path, fake_image):
         """测试完整提交流程"""
         with patch("scripts.wechat_client.requests") as mock_requests:
+            mock_requests.Session.return_value = mock_requests
             # 设置 mock 响应
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            cover_upload_response = MagicMock()
-            cover_upload_response.json.return_value = {
+            cover_upload_response = make_response({
                 "errcode": 0,
                 "media_id": "cover_media_id"
-            }
+            })
 
-            image_upload_response = MagicMock()
-            image_upload_response.json.return_value = {
+            image_upload_response = make_response({
                 "errcode": 0,
                 "url": "https://mmbiz.qpic.cn/uploaded.jpg"
-            }
+            })
 
-            draft_response = MagicMock()
-            draft_response.json.return_value = {
+            draft_response = make_response({
                 "errcode": 0,
                 "media_id": "draft_media_id"
-            }
+            })
 
-            mock_requests.get.return_value = token_response
+            mock_requests.get.return_value = TOKEN_RESPONSE
             mock_requests.request.side_effect = [
                 cover_upload_response,
                 image_upload_response,
@@ -305,14 +399,13 @@ class TestSubmitHtmlDraft:
             '''
             html_file.write_text(html_content, encoding="utf-8")
 
-            cover_file = tmp_path / "cover.png"
-            cover_file.write_bytes(b"fake cover image")
-
+            from scripts import WeChatClient
             from scripts.html_submitter import submit_html_draft
 
             media_id = submit_html_draft(
                 html_path=str(html_file),
-                cover_path=str(cover_file),
+                cover_path=str(fake_image),
+                client=WeChatClient(token_cache_dir=str(tmp_path)),
                 author="测试作者",
                 digest="测试摘要"
             )
@@ -320,22 +413,73 @@ class TestSubmitHtmlDraft:
             assert media_id == "draft_media_id"
 
     @pytest.mark.unit
-    def test_image_upload_error_file_not_found(self, mock_env_vars, tmp_path):
+    def test_submit_duplicate_image_uploaded_once(self, mock_env_vars, tmp_path, fake_image):
+        """测试重复引用（含不同路径写法）的图片只上传一次"""
+        with patch("scripts.wechat_client.requests") as mock_requests:
+            mock_requests.Session.return_value = mock_requests
+            cover_upload_response = make_response({
+                "errcode": 0,
+                "media_id": "cover_media_id"
+            })
+
+            image_upload_response = make_response({
+                "errcode": 0,
+                "url": "https://mmbiz.qpic.cn/uploaded.jpg"
+            })
+
+            draft_response = make_response({
+                "errcode": 0,
+                "media_id": "draft_media_id"
+            })
+
+            mock_requests.get.return_value = TOKEN_RESPONSE
+            mock_requests.request.side_effect = [
+                cover_upload_response,
+                image_upload_response,
+                draft_response
+            ]
+
+            image_file = tmp_path / "image.png"
+            image_file.write_bytes(b"fake image data")
+            (tmp_path / "sub").mkdir()
+
+            # 三种写法指向同一文件
+            html_file = tmp_path / "test.html"
+            html_file.write_text(
+                '<html><head><title>测试</title></head><body>'
+                '<img src="image.png" /><p>中间</p><img src=\'image.png\' />'
+                '<img src="sub/../image.png" />'
+                '</body></html>',
+                encoding="utf-8"
+            )
+
+            from scripts import WeChatClient
+            from scripts.html_submitter import submit_html_draft
+
+            media_id = submit_html_draft(
+                html_path=str(html_file),
+                cover_path=str(fake_image),
+                client=WeChatClient(token_cache_dir=str(tmp_path))
+            )
+
+            assert media_id == "draft_media_id"
+            assert mock_requests.request.call_count == 3
+
+            draft_body = mock_requests.request.call_args.kwargs["data"].decode("utf-8")
+            assert draft_body.count("https://mmbiz.qpic.cn/uploaded.jpg") == 3
+            assert "image.png" not in draft_body
+
+    @pytest.mark.unit
+    def test_image_upload_error_file_not_found(self, mock_env_vars, tmp_path, fake_image):
         """测试正文图片不存在时的错误"""
         with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            cover_upload_response = MagicMock()
-            cover_upload_response.json.return_value = {
+            mock_requests.Session.return_value = mock_requests
+            cover_upload_response = make_response({
                 "errcode": 0,
                 "media_id": "cover_media_id"
-            }
+            })
 
-            mock_requests.get.return_value = token_response
+            mock_requests.get.return_value = TOKEN_RESPONSE
             mock_requests.request.return_value = cover_upload_response
 
             # 创建 HTML 引用不存在的图片
@@ -350,18 +494,80 @@ class TestSubmitHtmlDraft:
             '''
             html_file.write_text(html_content, encoding="utf-8")
 
-            cover_file = tmp_path / "cover.png"
-            cover_file.write_bytes(b"fake cover")
-
+            from scripts import WeChatClient
             from scripts.html_submitter import submit_html_draft, ImageUploadError
 
             with pytest.raises(ImageUploadError, match="文件不存在"):
                 submit_html_draft(
                     html_path=str(html_file),
-                    cover_path=str(cover_file)
+                    cover_path=str(fake_image),
+                    client=WeChatClient(token_cache_dir=str(tmp_path))
                 )
 
 
+    @pytest.mark.unit
+    def test_image_stat_os_error_wrapped(self, patched_client, wechat_api, tmp_path, fake_image):
+        """测试正文图片 stat 出现其他 OSError 时同样包装为 ImageUploadError"""
+        from scripts.html_submitter import submit_html_draft, ImageUploadError
+
+        wechat_api.post(
+            "https://api.weixin.qq.com/cgi-bin/material/add_material",
+            json={"errcode": 0, "media_id": "cover_media_id"}
+        )
+
+        # 父路径是普通文件，os.stat 抛出 NotADirectoryError 而非 FileNotFoundError
+        (tmp_path / "plain.txt").write_text("x")
+        html_file = tmp_path / "test.html"
+        html_file.write_text(
+            '<html><head><title>测试</title></head>'
+            '<body><img src="plain.txt/image.png" /></body></html>',
+            encoding="utf-8"
+        )
+
+        with pytest.raises(ImageUploadError) as exc_info:
+            submit_html_draft(
+                html_path=str(html_file),
+                cover_path=str(fake_image),
+                client=patched_client
+            )
+
+        assert exc_info.value.path == str(tmp_path / "plain.txt/image.png")
+
+    @pytest.mark.unit
+    def test_image_upload_error_reports_html_path(self, patched_client, wechat_api, tmp_path, fake_image):
+        """测试正文图片上传失败时报告 HTML 中书写的路径，而非符号链接解析后的路径"""
+        from scripts.html_submitter import submit_html_draft, ImageUploadError
+
+        wechat_api.post(
+            "https://api.weixin.qq.com/cgi-bin/material/add_material",
+            json={"errcode": 0, "media_id": "cover_media_id"}
+        )
+        wechat_api.post(
+            "https://api.weixin.qq.com/cgi-bin/media/uploadimg",
+            json={"errcode": 40005, "errmsg": "invalid file type"}
+        )
+
+        (tmp_path / "real.png").write_bytes(b"fake image data")
+        try:
+            os.symlink(tmp_path / "real.png", tmp_path / "link.png")
+        except (OSError, NotImplementedError):
+            pytest.skip("当前平台不支持符号链接")
+        html_file = tmp_path / "test.html"
+        html_file.write_text(
+            '<html><head><title>测试</title></head>'
+            '<body><img src="link.png" /></body></html>',
+            encoding="utf-8"
+        )
+
+        with pytest.raises(ImageUploadError) as exc_info:
+            submit_html_draft(
+                html_path=str(html_file),
+                cover_path=str(fake_image),
+                client=patched_client
+            )
+
+        assert exc_info.value.path == str(tmp_path / "link.png")
+
 class TestExceptionClasses:
     """测试异常类"""
 
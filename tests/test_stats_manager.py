@@ -2,287 +2,251 @@
 StatsManager 单元测试
 """
 
+import re
+
 import pytest
-from datetime import datetime, timedelta
-from unittest.mock import patch, MagicMock
+from datetime import date, datetime, timedelta
+from unittest.mock import MagicMock
+from responses import matchers
+
+from scripts import StatsManager
+
+API_BASE = "https://api.weixin.qq.com"
+
+
+def _yesterday() -> str:
+    """本地时区昨天的 YYYY-MM-DD 字符串"""
+    return (date.today() - timedelta(days=1)).isoformat()
 
 
 class TestStatsManagerInit:
     """测试数据统计管理器初始化"""
 
     @pytest.mark.unit
-    def test_init_with_client(self, mock_client):
+    def test_init_with_client(self, patched_client):
         """测试通过客户端初始化"""
-        from scripts import StatsManager
-        sm = StatsManager(mock_client)
-        assert sm.client == mock_client
+        sm = StatsManager(patched_client)
+        assert sm.client == patched_client
 
 
 class TestDateValidation:
     """测试日期验证"""
 
     @pytest.mark.unit
-    def test_validate_date_range_begin_after_end(self, mock_client):
+    def test_validate_date_range_begin_after_end(self, patched_client):
         """测试开始日期晚于结束日期"""
-        from scripts import StatsManager
-        sm = StatsManager(mock_client)
+        sm = StatsManager(patched_client)
 
         with pytest.raises(ValueError, match="开始日期不能晚于结束日期"):
             sm._validate_date_range("2024-01-10", "2024-01-01", 7)
 
     @pytest.mark.unit
-    def test_validate_date_range_exceed_max_days(self, mock_client):
+    def test_validate_date_range_exceed_max_days(self, patched_client):
         """测试超过最大天数"""
-        from scripts import StatsManager
-        sm = StatsManager(mock_client)
+        sm = StatsManager(patched_client)
 
         with pytest.raises(ValueError, match="日期跨度不能超过 7 天"):
             sm._validate_date_range("2024-01-01", "2024-01-10", 7)
 
     @pytest.mark.unit
-    def test_validate_date_range_future_date(self, mock_client):
+    def test_validate_date_range_future_date(self, patched_client):
         """测试未来日期"""
-        from scripts import StatsManager
-        sm = StatsManager(mock_client)
+        sm = StatsManager(patched_client)
 
         future = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
         with pytest.raises(ValueError, match="结束日期不能是今天或未来日期"):
             sm._validate_date_range(future, future, 7)
 
+    @pytest.mark.unit
+    def test_validate_date_range_today(self, patched_client):
+        """测试结束日期为今天"""
+        sm = StatsManager(patched_client)
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        with pytest.raises(ValueError, match="结束日期不能是今天或未来日期"):
+            sm._validate_date_range(today, today, 7)
+
+    @pytest.mark.unit
+    def test_validate_single_date(self, patched_client):
+        """测试单日日期验证"""
+        sm = StatsManager(patched_client)
+
+        yesterday = _yesterday()
+        sm._validate_single_date(yesterday)
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        with pytest.raises(ValueError, match="结束日期不能是今天或未来日期"):
+            sm._validate_single_date(today)
+
+    @pytest.mark.unit
+    def test_validate_date_range_invalid_format(self, patched_client):
+        """测试日期格式错误"""
+        sm = StatsManager(patched_client)
+
+        for value in (
+            "2024-1-1", "2024/01/01", "2024-02-30",
+            "2024-+1-01", "2024-01- 1", "2_24-01-01", "２０２４-01-01",
+        ):
+            with pytest.raises(ValueError, match="日期格式错误"):
+                sm._validate_date_range(value, "2024-03-01", 7)
+
 
 class TestUserStats:
     """测试用户数据统计"""
 
     @pytest.mark.unit
-    def test_get_user_summary(self, mock_env_vars):
+    def test_get_user_summary(self, patched_client, wechat_api):
         """测试获取用户增减数据"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            stats_response = MagicMock()
-            stats_response.json.return_value = {
-                "errcode": 0,
-                "list": [
-                    {"ref_date": "2024-01-01", "new_user": 10, "cancel_user": 2}
-                ]
-            }
-
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = stats_response
-
-            from scripts import WeChatClient, StatsManager
-            client = WeChatClient()
-            sm = StatsManager(client)
-
-            yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-            result = sm.get_user_summary(yesterday, yesterday)
-
-            assert len(result) == 1
-            assert result[0]["new_user"] == 10
-
-    @pytest.mark.unit
-    def test_get_user_cumulate(self, mock_env_vars):
-        """测试获取累计用户数据"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
+        yesterday = _yesterday()
+        wechat_api.post(
+            f"{API_BASE}/datacube/getusersummary",
+            json={"errcode": 0, "list": [{"ref_date": "2024-01-01", "new_user": 10, "cancel_user": 2}]},
+            match=[matchers.json_params_matcher({
+                "begin_date": yesterday, "end_date": yesterday
+            })]
+        )
 
-            stats_response = MagicMock()
-            stats_response.json.return_value = {
-                "errcode": 0,
-                "list": [
-                    {"ref_date": "2024-01-01", "cumulate_user": 1000}
-                ]
-            }
+        sm = StatsManager(patched_client)
+        result = sm.get_user_summary(yesterday, yesterday)
 
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = stats_response
+        assert len(result) == 1
+        assert result[0]["new_user"] == 10
 
-            from scripts import WeChatClient, StatsManager
-            client = WeChatClient()
-            sm = StatsManager(client)
+    @pytest.mark.unit
+    def test_get_user_cumulate(self, patched_client, wechat_api):
+        """测试获取累计用户数据"""
+        yesterday = _yesterday()
+        wechat_api.post(
+            f"{API_BASE}/datacube/getusercumulate",
+            json={"errcode": 0, "list": [{"ref_date": "2024-01-01", "cumulate_user": 1000}]},
+            match=[matchers.json_params_matcher({
+                "begin_date": yesterday, "end_date": yesterday
+            })]
+        )
 
-            yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-            result = sm.get_user_cumulate(yesterday, yesterday)
+        sm = StatsManager(patched_client)
+        result = sm.get_user_cumulate(yesterday, yesterday)
 
-            assert len(result) == 1
-            assert result[0]["cumulate_user"] == 1000
+        assert len(result) == 1
+        assert result[0]["cumulate_user"] == 1000
 
 
 class TestArticleStats:
     """测试图文数据统计"""
 
     @pytest.mark.unit
-    def test_get_article_summary(self, mock_env_vars):
+    def test_get_article_summary(self, patched_client, wechat_api):
         """测试获取图文每日数据"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            stats_response = MagicMock()
-            stats_response.json.return_value = {
-                "errcode": 0,
-                "list": [
-                    {
-                        "ref_date": "2024-01-01",
-                        "title": "测试文章",
-                        "int_page_read_count": 100,
-                        "share_count": 10
-                    }
-                ]
-            }
-
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = stats_response
-
-            from scripts import WeChatClient, StatsManager
-            client = WeChatClient()
-            sm = StatsManager(client)
-
-            yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-            result = sm.get_article_summary(yesterday)
-
-            assert len(result) == 1
-            assert result[0]["int_page_read_count"] == 100
+        yesterday = _yesterday()
+        wechat_api.post(
+            f"{API_BASE}/datacube/getarticlesummary",
+            json={"errcode": 0, "list": [{"ref_date": "2024-01-01", "title": "测试文章", "int_page_read_count": 100}]},
+            match=[matchers.json_params_matcher({
+                "begin_date": yesterday, "end_date": yesterday
+            })]
+        )
 
-    @pytest.mark.unit
-    def test_get_user_read_hour(self, mock_env_vars):
-        """测试获取分时阅读数据"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            stats_response = MagicMock()
-            stats_response.json.return_value = {
-                "errcode": 0,
-                "list": [
-                    {"ref_date": "2024-01-01", "ref_hour": 10, "int_page_read_count": 50}
-                ]
-            }
+        sm = StatsManager(patched_client)
+        result = sm.get_article_summary(yesterday)
 
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = stats_response
+        assert len(result) == 1
+        assert result[0]["int_page_read_count"] == 100
 
-            from scripts import WeChatClient, StatsManager
-            client = WeChatClient()
-            sm = StatsManager(client)
+    @pytest.mark.unit
+    def test_get_user_read_hour(self, patched_client, wechat_api):
+        """测试获取分时阅读数据"""
+        yesterday = _yesterday()
+        wechat_api.post(
+            f"{API_BASE}/datacube/getuserreadhour",
+            json={"errcode": 0, "list": [{"ref_date": "2024-01-01", "ref_hour": 10, "int_page_read_count": 50}]},
+            match=[matchers.json_params_matcher({
+                "begin_date": yesterday, "end_date": yesterday
+            })]
+        )
 
-            yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-            result = sm.get_user_read_hour(yesterday)
+        sm = StatsManager(patched_client)
+        result = sm.get_user_read_hour(yesterday)
 
-            assert len(result) == 1
-            assert result[0]["ref_hour"] == 10
+        assert len(result) == 1
+        assert result[0]["ref_hour"] == 10
 
 
 class TestMessageStats:
     """测试消息数据统计"""
 
     @pytest.mark.unit
-    def test_get_upstream_msg(self, mock_env_vars):
+    def test_get_upstream_msg(self, patched_client, wechat_api):
         """测试获取消息发送数据"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
+        yesterday = _yesterday()
+        wechat_api.post(
+            f"{API_BASE}/datacube/getupstreammsg",
+            json={"errcode": 0, "list": [{"ref_date": "2024-01-01", "msg_count": 500}]},
+            match=[matchers.json_params_matcher({
+                "begin_date": yesterday, "end_date": yesterday
+            })]
+        )
 
-            stats_response = MagicMock()
-            stats_response.json.return_value = {
-                "errcode": 0,
-                "list": [
-                    {"ref_date": "2024-01-01", "msg_count": 500}
-                ]
-            }
+        sm = StatsManager(patched_client)
+        result = sm.get_upstream_msg(yesterday, yesterday)
 
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = stats_response
-
-            from scripts import WeChatClient, StatsManager
-            client = WeChatClient()
-            sm = StatsManager(client)
-
-            yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-            result = sm.get_upstream_msg(yesterday, yesterday)
-
-            assert len(result) == 1
-            assert result[0]["msg_count"] == 500
+        assert len(result) == 1
+        assert result[0]["msg_count"] == 500
 
 
 class TestConvenienceMethods:
     """测试便捷方法"""
 
     @pytest.mark.unit
-    def test_get_yesterday_summary(self, mock_env_vars):
+    def test_get_yesterday_summary(self, patched_client, wechat_api):
         """测试获取昨日概览"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            stats_response = MagicMock()
-            stats_response.json.return_value = {
-                "errcode": 0,
-                "list": []
-            }
-
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = stats_response
-
-            from scripts import WeChatClient, StatsManager
-            client = WeChatClient()
-            sm = StatsManager(client)
-
-            result = sm.get_yesterday_summary()
-
-            assert "date" in result
-            assert "user" in result
-            assert "user_cumulate" in result
-            assert "article" in result
-            assert "share" in result
+        wechat_api.post(
+            re.compile(f"{API_BASE}/datacube/.+"),
+            json={"errcode": 0, "list": []}
+        )
+
+        sm = StatsManager(patched_client)
+        result = sm.get_yesterday_summary()
+
+        assert result["date"] == _yesterday()
+        assert "user" in result
+        assert "user_cumulate" in result
+        assert "article" in result
+        assert "share" in result
+        assert len(wechat_api.calls) == 4
 
     @pytest.mark.unit
-    def test_get_week_summary(self, mock_env_vars):
+    def test_get_week_summary(self, patched_client, wechat_api):
         """测试获取本周概览"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
-
-            stats_response = MagicMock()
-            stats_response.json.return_value = {
-                "errcode": 0,
-                "list": []
-            }
-
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = stats_response
-
-            from scripts import WeChatClient, StatsManager
-            client = WeChatClient()
-            sm = StatsManager(client)
-
-            result = sm.get_week_summary()
-
-            assert "begin_date" in result
-            assert "end_date" in result
-            assert "user" in result
-            assert "user_cumulate" in result
-            assert "share" in result
+        wechat_api.post(
+            re.compile(f"{API_BASE}/datacube/.+"),
+            json={"errcode": 0, "list": []}
+        )
+
+        sm = StatsManager(patched_client)
+        result = sm.get_week_summary()
+
+        assert "begin_date" in result
+        assert result["end_date"] == _yesterday()
+        assert "user" in result
+        assert "user_cumulate" in result
+        assert "share" in result
+        assert len(wechat_api.calls) == 3
+
+    @pytest.mark.unit
+    def test_fan_out_preserves_order(self):
+        """测试并发请求结果与任务顺序一致"""
+        client = MagicMock()
+        client.post.side_effect = lambda endpoint, json_data: {
+            "list": [{"endpoint": endpoint}]
+        }
+        sm = StatsManager(client)
+
+        result = sm._fan_out([
+            ("/datacube/a", {}),
+            ("/datacube/b", {}),
+            ("/datacube/c", {}),
+        ])
+
+        assert [r[0]["endpoint"] for r in result] == [
+            "/datacube/a", "/datacube/b", "/datacube/c"
+        ]
@@ -2,180 +2,421 @@
 WeChatClient 单元测试
 """
 
+import json
 import os
+import subprocess
+import sys
+import threading
+import time
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock
+from responses import matchers
+
+import scripts.wechat_client as wechat_client
+from scripts import WeChatClient, WeChatAPIError
+from scripts.wechat_client import load_dotenv
+
+from .conftest import TOKEN_RESPONSE, make_response
+
+API_BASE = "https://api.weixin.qq.com"
 
 
 class TestWeChatClientInit:
     """测试客户端初始化"""
 
     @pytest.mark.unit
-    def test_init_with_params(self, mock_env_vars):
+    def test_init_with_params(self, mock_requests):
         """测试通过参数初始化"""
-        with patch("scripts.wechat_client.requests"):
-            from scripts import WeChatClient
-            client = WeChatClient(appid="param_appid", appsecret="param_secret")
-            assert client.appid == "param_appid"
-            assert client.appsecret == "param_secret"
+        client = WeChatClient(appid="param_appid", appsecret="param_secret")
+        assert client.appid == "param_appid"
+        assert client.appsecret == "param_secret"
 
     @pytest.mark.unit
-    def test_init_with_env_vars(self, mock_env_vars):
+    def test_init_with_env_vars(self, mock_requests):
         """测试通过环境变量初始化"""
-        with patch("scripts.wechat_client.requests"):
-            from scripts import WeChatClient
-            client = WeChatClient()
+        client = WeChatClient()
+        assert client.appid == "test_appid"
+        assert client.appsecret == "test_appsecret"
+
+    @pytest.mark.unit
+    def test_init_creates_pooled_session(self, mock_env_vars, tmp_path):
+        """测试初始化时创建带连接池的 Session"""
+        client = WeChatClient(token_cache_dir=str(tmp_path))
+
+        adapter = client._session.get_adapter(WeChatClient.BASE_URL)
+        assert adapter._pool_maxsize == WeChatClient.POOL_MAXSIZE
+        assert adapter.max_retries.total == WeChatClient.MAX_RETRIES
+
+    @pytest.mark.unit
+    def test_import_does_not_load_requests(self):
+        """测试导入 scripts 包时不导入 requests"""
+        code = "import sys, scripts; print('requests' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        assert result.stdout.strip() == "False"
+
+    @pytest.mark.unit
+    def test_client_uses_slots(self, patched_client):
+        """测试客户端不创建实例 __dict__"""
+        assert not hasattr(patched_client, "__dict__")
+        with pytest.raises(AttributeError):
+            patched_client.unknown_attr = 1
+
+    @pytest.mark.unit
+    def test_context_manager_closes_session(self, mock_requests):
+        """测试 with 语句退出时关闭连接"""
+        with WeChatClient() as client:
             assert client.appid == "test_appid"
-            assert client.appsecret == "test_appsecret"
+
+        mock_requests.close.assert_called_once()
 
     @pytest.mark.unit
-    def test_init_missing_credentials(self):
+    def test_init_missing_credentials(self, monkeypatch):
         """测试缺少凭证时抛出异常"""
-        with patch.dict(os.environ, {"HOME": "/tmp", "USERPROFILE": "C:\\Users\\test"}, clear=True):
-            with patch("scripts.wechat_client.find_dotenv", return_value=""):
-                from scripts import WeChatClient
-                with pytest.raises(ValueError, match="请设置 WECHAT_APPID"):
-                    WeChatClient()
+        monkeypatch.delenv("WECHAT_APPID", raising=False)
+        monkeypatch.delenv("WECHAT_APPSECRET", raising=False)
+        monkeypatch.setattr(wechat_client, "find_dotenv", lambda *args, **kwargs: "")
+
+        with pytest.raises(ValueError, match="请设置 WECHAT_APPID"):
+            WeChatClient()
 
 
 class TestAccessToken:
     """测试 access_token 管理"""
 
     @pytest.mark.unit
-    def test_get_access_token(self, mock_env_vars, tmp_path):
+    def test_get_access_token(self, mock_requests, tmp_path):
         """测试获取 access_token"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            mock_response = MagicMock()
-            mock_response.json.return_value = {
-                "access_token": "test_token_12345",
-                "expires_in": 7200
-            }
-            mock_requests.get.return_value = mock_response
+        mock_requests.get.return_value = make_response({
+            "access_token": "test_token_12345",
+            "expires_in": 7200
+        })
 
-            from scripts.wechat_client import WeChatClient
-            # 使用临时目录避免加载缓存
-            client = WeChatClient(token_cache_dir=str(tmp_path))
-            token = client.get_access_token()
+        # 使用临时目录避免加载缓存
+        client = WeChatClient(token_cache_dir=str(tmp_path))
+        token = client.get_access_token()
 
-            assert token == "test_token_12345"
+        assert token == "test_token_12345"
 
     @pytest.mark.unit
-    def test_token_caching(self, mock_client):
+    def test_token_caching(self, patched_client, wechat_api):
         """测试 token 缓存"""
-        # 第一次获取
-        token1 = mock_client.get_access_token()
-        # 第二次应该使用缓存
-        token2 = mock_client.get_access_token()
-        assert token1 == token2
+        # 已预置有效 token，两次获取都直接使用缓存
+        token1 = patched_client.get_access_token()
+        token2 = patched_client.get_access_token()
+        assert token1 == token2 == "test_token"
+        assert len(wechat_api.calls) == 0
+
+    @pytest.mark.unit
+    def test_token_expiry_buffer(self, mock_env_vars, tmp_path):
+        """测试 token 在缓冲期内视为失效"""
+        client = WeChatClient(token_cache_dir=str(tmp_path))
+
+        client._set_token("fresh_token", time.time() + 3600)
+        assert client._is_token_valid()
+
+        client._set_token("stale_token", time.time() + 60)
+        assert not client._is_token_valid()
+
+    @pytest.mark.unit
+    def test_token_cache_roundtrip(self, mock_env_vars, tmp_path):
+        """测试 token 缓存原子写入并可被新实例加载"""
+        client = WeChatClient(token_cache_dir=str(tmp_path))
+        client._set_token("cached_token", time.time() + 3600)
+        client._save_token_cache()
+
+        assert [p.name for p in tmp_path.iterdir()] == [
+            WeChatClient.TOKEN_CACHE_FILE
+        ]
+
+        reloaded = WeChatClient(token_cache_dir=str(tmp_path))
+        assert reloaded.get_access_token() == "cached_token"
 
     @pytest.mark.unit
-    def test_force_refresh_token(self, mock_env_vars):
+    def test_concurrent_token_cache_writes(self, mock_env_vars, tmp_path):
+        """测试同进程内多个客户端并发写缓存互不干扰"""
+        clients = [WeChatClient(token_cache_dir=str(tmp_path)) for _ in range(8)]
+        for i, client in enumerate(clients):
+            client._set_token(f"token_{i}", time.time() + 3600)
+
+        threads = [threading.Thread(target=c._save_token_cache) for c in clients]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert [p.name for p in tmp_path.iterdir()] == [
+            WeChatClient.TOKEN_CACHE_FILE
+        ]
+        reloaded = WeChatClient(token_cache_dir=str(tmp_path))
+        assert reloaded.get_access_token() in {f"token_{i}" for i in range(8)}
+
+    @pytest.mark.unit
+    def test_force_refresh_token(self, mock_requests, tmp_path):
         """测试强制刷新 token"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            mock_response = MagicMock()
-            mock_response.json.return_value = {
-                "access_token": "new_token",
-                "expires_in": 7200
-            }
-            mock_requests.get.return_value = mock_response
+        mock_response = make_response({
+            "access_token": "new_token",
+            "expires_in": 7200
+        })
+        mock_requests.get.return_value = mock_response
 
-            from scripts import WeChatClient
-            client = WeChatClient()
+        client = WeChatClient(token_cache_dir=str(tmp_path))
 
-            # 强制刷新
-            token = client.get_access_token(force_refresh=True)
-            assert token == "new_token"
+        # 强制刷新
+        token = client.get_access_token(force_refresh=True)
+        assert token == "new_token"
+
+    @pytest.mark.unit
+    def test_concurrent_token_fetch_once(self, mock_requests, tmp_path):
+        """测试多线程同时获取 token 时只请求一次"""
+        mock_response = make_response({
+            "access_token": "concurrent_token",
+            "expires_in": 7200
+        })
+
+        def slow_get(*args, **kwargs):
+            time.sleep(0.05)
+            return mock_response
+
+        mock_requests.get.side_effect = slow_get
+
+        client = WeChatClient(token_cache_dir=str(tmp_path))
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            tokens = list(executor.map(
+                lambda _: client.get_access_token(), range(4)
+            ))
+
+        assert tokens == ["concurrent_token"] * 4
+        assert mock_requests.get.call_count == 1
 
 
 class TestApiRequest:
     """测试 API 请求"""
 
     @pytest.mark.unit
-    def test_get_request(self, mock_env_vars):
-        """测试 GET 请求"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            # Token 响应
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
+    @pytest.mark.parametrize("method, json_data, body, expected", [
+        ("GET", None, {"errcode": 0, "data": "test"}, ("data", "test")),
+        ("POST", {"key": "value"}, {"errcode": 0, "media_id": "123"}, ("media_id", "123")),
+    ], ids=[
+        "get",
+        "post",
+    ])
+    def test_api_request(self, patched_client, wechat_api, method, json_data, body, expected):
+        """测试 GET/POST 请求"""
+        wechat_api.add(method, f"{API_BASE}/test/endpoint", json=body)
+
+        result = patched_client.request(method, "/test/endpoint", json_data=json_data)
+
+        key, value = expected
+        assert result[key] == value
+        if json_data is not None:
+            assert json.loads(wechat_api.calls[0].request.body) == json_data
+
+    @pytest.mark.unit
+    def test_api_error_handling(self, patched_client, wechat_api):
+        """测试 API 错误处理（token 类错误强制刷新一次后仍失败则抛出）"""
+        wechat_api.get(
+            f"{API_BASE}/test/endpoint",
+            json={"errcode": 40001, "errmsg": "invalid credential"}
+        )
+        wechat_api.get(
+            f"{API_BASE}/cgi-bin/token",
+            json={"access_token": "test_token", "expires_in": 7200}
+        )
+
+        with pytest.raises(WeChatAPIError) as exc_info:
+            patched_client.get("/test/endpoint")
+
+        assert exc_info.value.errcode == 40001
+        # 请求 -> 刷新 token -> 重试一次，不再继续刷新
+        paths = [call.request.path_url.split("?")[0] for call in wechat_api.calls]
+        assert paths == ["/test/endpoint", "/cgi-bin/token", "/test/endpoint"]
+
+    @pytest.mark.unit
+    def test_server_error_after_retries_returns_response(self, patched_client, wechat_api):
+        """测试 5xx 重试耗尽后仍走 errcode 处理而不是抛 RetryError"""
+        retry = patched_client._session.get_adapter(API_BASE).max_retries
+        assert retry.raise_on_status is False
+
+        wechat_api.get(
+            f"{API_BASE}/test/endpoint",
+            status=503,
+            json={"errcode": -1, "errmsg": "system error"}
+        )
+
+        with pytest.raises(WeChatAPIError) as exc_info:
+            patched_client.get("/test/endpoint")
+
+        assert exc_info.value.errcode == -1
+
+    @pytest.mark.unit
+    def test_request_does_not_mutate_params(self, patched_client, wechat_api):
+        """测试请求不修改调用方传入的 params"""
+        wechat_api.get(
+            f"{API_BASE}/test/endpoint",
+            json={"errcode": 0},
+            match=[matchers.query_param_matcher({
+                "media_id": "abc", "access_token": "test_token"
+            })]
+        )
 
-            # API 响应
-            api_response = MagicMock()
-            api_response.json.return_value = {"errcode": 0, "data": "test"}
+        params = {"media_id": "abc"}
+        patched_client.get("/test/endpoint", params=params)
 
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = api_response
+        assert params == {"media_id": "abc"}
 
-            from scripts import WeChatClient
-            client = WeChatClient()
-            result = client.get("/test/endpoint")
+    @pytest.mark.unit
+    def test_token_expired_retry(self, mock_requests, tmp_path):
+        """测试 token 过期时刷新并重试，请求体只序列化一次"""
+        expired_response = make_response({
+            "errcode": 40001,
+            "errmsg": "invalid credential"
+        })
+        ok_response = make_response({"errcode": 0, "media_id": "m1"})
+
+        mock_requests.get.return_value = TOKEN_RESPONSE
+        mock_requests.request.side_effect = [expired_response, ok_response]
+
+        client = WeChatClient(token_cache_dir=str(tmp_path))
+        result = client.post("/test/endpoint", json_data={"title": "标题"})
+
+        assert result["media_id"] == "m1"
+        assert mock_requests.get.call_count == 2
+        first, second = mock_requests.request.call_args_list
+        assert first.kwargs["data"] is second.kwargs["data"]
+        assert "标题".encode("utf-8") in second.kwargs["data"]
 
-            assert result["data"] == "test"
+    @pytest.mark.unit
+    def test_concurrent_token_error_refreshes_once(self, mock_requests, tmp_path):
+        """测试多个线程同时遇到 token 失效时只刷新一次 token"""
+        workers = 4
+        barrier = threading.Barrier(workers, timeout=5)
+
+        def fake_request(**kwargs):
+            if kwargs["params"]["access_token"] == "old_token":
+                # 所有线程都拿到 40001 后才继续，确保并发进入刷新流程
+                barrier.wait()
+                return make_response({"errcode": 40001, "errmsg": "invalid credential"})
+            return make_response({"errcode": 0, "token": kwargs["params"]["access_token"]})
+
+        mock_requests.get.return_value = make_response({
+            "access_token": "new_token",
+            "expires_in": 7200
+        })
+        mock_requests.request.side_effect = fake_request
+
+        client = WeChatClient(token_cache_dir=str(tmp_path))
+        client._set_token("old_token", time.time() + 3600)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(
+                lambda _: client.get("/test/endpoint"), range(workers)
+            ))
+
+        assert [r["token"] for r in results] == ["new_token"] * workers
+        assert mock_requests.get.call_count == 1
 
     @pytest.mark.unit
-    def test_post_request(self, mock_env_vars):
-        """测试 POST 请求"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
+    def test_token_expired_retry_resends_file(self, mock_requests, tmp_path):
+        """测试 token 过期重试时重新发送完整文件内容"""
+        expired_response = make_response({"errcode": 42001})
+        ok_response = make_response({"errcode": 0})
+        responses_iter = iter([expired_response, ok_response])
+
+        sent = []
 
-            api_response = MagicMock()
-            api_response.json.return_value = {"errcode": 0, "media_id": "123"}
+        def fake_request(**kwargs):
+            sent.append(kwargs["files"]["media"][1].read())
+            return next(responses_iter)
 
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = api_response
+        mock_requests.get.return_value = TOKEN_RESPONSE
+        mock_requests.request.side_effect = fake_request
 
-            from scripts import WeChatClient
-            client = WeChatClient()
-            result = client.post("/test/endpoint", json_data={"key": "value"})
+        file_path = tmp_path / "image.png"
+        file_path.write_bytes(b"image-bytes")
 
-            assert result["media_id"] == "123"
+        client = WeChatClient(token_cache_dir=str(tmp_path))
+        client.upload_file("/test/upload", str(file_path))
+
+        assert sent == [b"image-bytes", b"image-bytes"]
 
     @pytest.mark.unit
-    def test_api_error_handling(self, mock_env_vars):
-        """测试 API 错误处理"""
-        with patch("scripts.wechat_client.requests") as mock_requests:
-            token_response = MagicMock()
-            token_response.json.return_value = {
-                "access_token": "test_token",
-                "expires_in": 7200
-            }
+    def test_download_file_to_path(self, mock_requests, tmp_path):
+        """测试下载文件时流式写入指定路径"""
+        file_response = MagicMock()
+        file_response.headers = {"Content-Type": "image/png"}
+        file_response.iter_content.return_value = [b"part1", b"part2"]
+
+        mock_requests.get.side_effect = [TOKEN_RESPONSE, file_response]
+
+        client = WeChatClient(token_cache_dir=str(tmp_path))
+        save_path = tmp_path / "media.png"
+        result = client.download_file(
+            "/cgi-bin/media/get",
+            params={"media_id": "m1"},
+            save_path=str(save_path)
+        )
+
+        assert result == str(save_path)
+        assert save_path.read_bytes() == b"part1part2"
+        assert mock_requests.get.call_args.kwargs["stream"] is True
 
-            error_response = MagicMock()
-            error_response.json.return_value = {
-                "errcode": 40001,
-                "errmsg": "invalid credential"
-            }
+    @pytest.mark.unit
+    def test_download_file_json_error(self, mock_requests, tmp_path):
+        """测试下载返回 JSON 错误时抛出异常且不写入文件"""
+        error_response = MagicMock()
+        error_response.headers = {"Content-Type": "application/json"}
+        error_response.json.return_value = {
+            "errcode": 40007,
+            "errmsg": "invalid media_id"
+        }
 
-            mock_requests.get.return_value = token_response
-            mock_requests.request.return_value = error_response
+        mock_requests.get.side_effect = [TOKEN_RESPONSE, error_response]
 
-            from scripts import WeChatClient, WeChatAPIError
-            client = WeChatClient()
+        client = WeChatClient(token_cache_dir=str(tmp_path))
+        save_path = tmp_path / "media.png"
 
-            with pytest.raises(WeChatAPIError) as exc_info:
-                client.get("/test/endpoint")
+        with pytest.raises(WeChatAPIError) as exc_info:
+            client.download_file(
+                "/cgi-bin/media/get",
+                params={"media_id": "bad"},
+                save_path=str(save_path)
+            )
 
-            assert exc_info.value.errcode == 40001
+        assert exc_info.value.errcode == 40007
+        assert not save_path.exists()
+        error_response.iter_content.assert_not_called()
+        error_response.__exit__.assert_called_once()
 
 
 class TestLoadDotenv:
     """测试 .env 文件加载（python-dotenv 集成）"""
 
     @pytest.mark.unit
-    def test_load_dotenv_integration(self, tmp_path):
+    def test_load_dotenv_integration(self, static_env_file):
         """测试 python-dotenv 集成加载 .env 文件"""
-        # 创建临时 .env 文件
-        env_file = tmp_path / ".env"
-        env_file.write_text('TEST_VAR="test_value"\n')
-
-        from scripts.wechat_client import load_dotenv
-
         with patch.dict(os.environ, {}, clear=True):
-            load_dotenv(str(env_file))
+            load_dotenv(str(static_env_file))
             assert os.environ.get("TEST_VAR") == "test_value"
+
+    @pytest.mark.unit
+    def test_dotenv_searched_once(self, mock_requests, tmp_path, monkeypatch):
+        """测试 .env 只自动查找一次，显式指定 env_file 时重新加载"""
+        monkeypatch.setattr(wechat_client, "_dotenv_loaded", False)
+
+        with patch("scripts.wechat_client.find_dotenv", return_value="") as mock_find, \
+                patch("scripts.wechat_client.load_dotenv") as mock_load:
+            WeChatClient(token_cache_dir=str(tmp_path))
+            WeChatClient(token_cache_dir=str(tmp_path))
+            mock_find.assert_called_once()
+
+            env_file = str(tmp_path / ".env")
+            WeChatClient(token_cache_dir=str(tmp_path), env_file=env_file)
+            mock_load.assert_called_with(env_file)